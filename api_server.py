@@ -0,0 +1,314 @@
+"""Headless JSON API over WeatherService, for services that want Rain Check's cached weather.
+
+Run it under uvicorn (pip install "uvicorn[standard]"):
+
+    python api_server.py --workers 4          # or: WEB_CONCURRENCY=4 uvicorn api_server:app
+
+Endpoints:
+
+    GET  /weather?city=Cape+Town                one city
+    GET  /weather/bulk?city=Durban&city=Paris   several cities, also as city=Durban,Paris
+    POST /weather/bulk  {"cities": [...]}       the same, for long lists
+    GET  /healthz
+
+Responses carry a weak ETag derived from the cache timestamp, so repeating
+a request with If-None-Match returns 304 until the city is refetched, and
+are gzip-compressed for clients that accept it. Workers share the persistent
+cache backend (WEATHER_CACHE_BACKEND) and each keeps its own in-memory cache.
+
+The OpenWeather token bucket is per process unless OPENWEATHER_RATE_LIMIT_SHARED=1,
+so more than one worker needs the shared limiter (or the limit disabled). With
+metrics enabled, each worker serves them on the first free port from RAINCHECK_METRICS_PORT.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs
+from cities import normalize_city
+from memory_cache import LRUCache
+from metrics import Counter, start_metrics_server
+from openweather_client import CALLS_PER_MINUTE, SHARED_LIMIT
+from rate_limiter import RateLimited
+from weather_service import WeatherService, CACHE_TTL
+
+API_PORT = int(os.getenv("RAINCHECK_API_PORT", "8000"))
+
+# Worker processes; uvicorn reads the same variable, and main() sets it from --workers
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Most cities one bulk request may ask for
+BULK_LIMIT = int(os.getenv("RAINCHECK_API_BULK_LIMIT", "100"))
+
+# Cache misses block on the database and OpenWeather, so they run on threads
+API_THREADS = int(os.getenv("RAINCHECK_API_THREADS", "16"))
+
+# Smaller bodies are sent uncompressed
+GZIP_MIN_SIZE = 512
+MAX_BODY_SIZE = 1024 * 1024
+
+# Encoded responses per (city, fetch time), shared by every request in the worker
+_responses = LRUCache(maxsize=4096)
+
+API_REQUESTS = Counter(
+    "raincheck_api_requests_total", "API responses by route and status", ["route", "status"]
+)
+
+_service = None
+_executor = ThreadPoolExecutor(max_workers=API_THREADS, thread_name_prefix="api")
+
+
+class _Encoded:
+    """A JSON body with its ETag and, once requested, its gzipped form"""
+
+    __slots__ = ("etag", "body", "gzipped", "fetched_at")
+
+    def __init__(self, etag, body, fetched_at):
+        self.etag = etag
+        self.body = body
+        self.gzipped = None
+        self.fetched_at = fetched_at
+
+    def gzip(self):
+        if self.gzipped is None:
+            self.gzipped = gzip.compress(self.body, compresslevel=6)
+        return self.gzipped
+
+def _etag(*parts):
+    return 'W/"' + hashlib.blake2b("|".join(parts).encode(), digest_size=12).hexdigest() + '"'
+
+def _encode_weather(key, weather_data):
+    """One city's weather as JSON, encoded once per fetch"""
+    fetched_at = weather_data["fetched_at"]
+    encoded = _responses.get((key, fetched_at))
+    if encoded is None:
+        # age_seconds and stale change with time, so the body leaves them out;
+        # clients get fetched_at and a matching Cache-Control max-age instead
+        body = json.dumps({
+            "city": key,
+            "fetched_at": fetched_at.isoformat() + "Z",
+            "current": weather_data["current"],
+            "hourly": weather_data["hourly"],
+            "daily": weather_data["daily"],
+        }, separators=(",", ":")).encode()
+        encoded = _Encoded(_etag(key, fetched_at.isoformat()), body, fetched_at)
+        _responses.set((key, fetched_at), encoded)
+    return encoded
+
+def _max_age(fetched_at):
+    """Seconds until cached weather fetched at fetched_at goes stale"""
+    return max(0, int((CACHE_TTL - (datetime.utcnow() - fetched_at)).total_seconds()))
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+def _not_modified(scope, etag):
+    if_none_match = _header(scope, b"if-none-match")
+    if not if_none_match:
+        return False
+    # Weak comparison: W/"x" and "x" match
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+async def _respond(send, route, status, body=b"", headers=()):
+    API_REQUESTS.inc(route, str(status))
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _respond_error(send, route, status, message, headers=()):
+    body = json.dumps({"error": message}).encode()
+    await _respond(send, route, status, body, [(b"content-type", b"application/json"), *headers])
+
+async def _respond_json(scope, send, route, body, etag=None, max_age=None, gzipped=None):
+    """Send a JSON body, or 304 when the client's ETag still matches"""
+    headers = [(b"content-type", b"application/json"), (b"vary", b"accept-encoding")]
+    if etag is not None:
+        headers.append((b"etag", etag.encode()))
+        if max_age is not None:
+            headers.append((b"cache-control", f"max-age={max_age}".encode()))
+        if _not_modified(scope, etag):
+            await _respond(send, route, 304, b"", headers[1:])
+            return
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in _header(scope, b"accept-encoding"):
+        body = gzipped() if gzipped else gzip.compress(body, compresslevel=6)
+        headers.append((b"content-encoding", b"gzip"))
+    await _respond(send, route, 200, body, headers)
+
+async def _in_thread(func):
+    return await asyncio.get_running_loop().run_in_executor(_executor, func)
+
+async def _weather(scope, send, query):
+    city = (query.get("city") or [""])[0].strip()
+    if not city:
+        await _respond_error(send, "weather", 400, "Missing city parameter")
+        return
+    # Fresh in-memory entries are served without leaving the event loop
+    weather_data = _service.get_cached_weather(city)
+    if weather_data is None:
+        try:
+            weather_data = await _in_thread(lambda: _service.get_weather_data(city, record_history=False))
+        except RateLimited as e:
+            await _respond_error(send, "weather", 503, str(e), [(b"retry-after", str(max(1, round(e.retry_after))).encode())])
+            return
+        except ValueError as e:
+            await _respond_error(send, "weather", 404 if "not found" in str(e) else 400, str(e))
+            return
+        except Exception as e:
+            await _respond_error(send, "weather", 502, str(e))
+            return
+    encoded = _encode_weather(normalize_city(city), weather_data)
+    await _respond_json(scope, send, "weather", encoded.body, encoded.etag,
+                        _max_age(encoded.fetched_at), encoded.gzip)
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_SIZE:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+async def _weather_bulk(scope, receive, send, query):
+    try:
+        if scope["method"] == "POST":
+            body = json.loads(await _read_body(receive) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError('body must be a JSON object like {"cities": [...]}')
+            cities = body.get("cities") or []
+            if not isinstance(cities, list) or not all(isinstance(city, str) for city in cities):
+                raise ValueError("cities must be a list of names")
+        else:
+            cities = [city for value in query.get("city", []) for city in value.split(",")]
+    except ValueError as e:
+        await _respond_error(send, "bulk", 400, f"Invalid request: {str(e)}")
+        return
+    names = list(dict.fromkeys(city.strip() for city in cities if city.strip()))
+    if not names:
+        await _respond_error(send, "bulk", 400, "No cities given")
+        return
+    if len(names) > BULK_LIMIT:
+        await _respond_error(send, "bulk", 400, f"At most {BULK_LIMIT} cities per request")
+        return
+
+    # Spellings of one city ("Paris", "paris") share a lookup, and each
+    # requested name gets the answer under its own spelling
+    keys = {name: normalize_city(name) for name in names}
+    lookups = {}
+    for name, key in keys.items():
+        lookups.setdefault(key, name)
+    results = {key: _service.get_cached_weather(city) for key, city in lookups.items()}
+    errors = {}
+    if not all(results.values()):
+        try:
+            fetched, failed = await _in_thread(lambda: _service.get_weather_bulk(list(lookups.values())))
+        except Exception as e:
+            await _respond_error(send, "bulk", 502, str(e))
+            return
+        results = {key: fetched[city] for key, city in lookups.items() if city in fetched}
+        errors = {name: failed[lookups[key]] for name, key in keys.items() if lookups[key] in failed}
+
+    encoded = {name: _encode_weather(key, results[key]) for name, key in keys.items() if key in results}
+    if not encoded or errors:
+        await _respond_json(scope, send, "bulk", _splice(encoded, errors))
+        return
+    # A complete answer is cached like a single city's, by its ETag
+    etag = _etag(*(f"{city}={entry.etag}" for city, entry in encoded.items()))
+    bulk = _responses.get(etag)
+    if bulk is None:
+        bulk = _Encoded(etag, _splice(encoded, errors), min(entry.fetched_at for entry in encoded.values()))
+        _responses.set(etag, bulk)
+    await _respond_json(scope, send, "bulk", bulk.body, etag, _max_age(bulk.fetched_at), bulk.gzip)
+
+def _splice(encoded, errors):
+    """Bulk response body from the per-city bodies, without re-encoding them"""
+    return b'{"results":{' + b",".join(
+        json.dumps(city).encode() + b":" + entry.body for city, entry in encoded.items()
+    ) + b'},"errors":' + json.dumps(errors).encode() + b"}"
+
+def _check_workers(workers):
+    """Refuse to run several workers that would each spend the full OpenWeather budget"""
+    if workers > 1 and CALLS_PER_MINUTE > 0 and not SHARED_LIMIT:
+        raise ValueError(
+            f"{workers} workers would each allow {CALLS_PER_MINUTE:g} OpenWeather calls per minute; "
+            "set OPENWEATHER_RATE_LIMIT_SHARED=1 to share one budget, or OPENWEATHER_CALLS_PER_MINUTE=0"
+        )
+
+async def _lifespan(receive, send):
+    global _service
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                _check_workers(WORKERS)
+                _service = WeatherService()
+                # Each worker takes the first free metrics port after RAINCHECK_METRICS_PORT
+                start_metrics_server(attempts=WORKERS)
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    method = scope["method"]
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    if path == "/healthz":
+        await _respond(send, "healthz", 200, b'{"status":"ok"}', [(b"content-type", b"application/json")])
+    elif path == "/weather" and method == "GET":
+        await _weather(scope, send, query)
+    elif path == "/weather/bulk" and method in ("GET", "POST"):
+        await _weather_bulk(scope, receive, send, query)
+    elif path in ("/weather", "/weather/bulk"):
+        await _respond_error(send, "other", 405, "Method not allowed")
+    else:
+        await _respond_error(send, "other", 404, "Not found")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve cached weather as JSON over HTTP")
+    parser.add_argument("--host", default="0.0.0.0", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=API_PORT, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    args = parser.parse_args()
+    try:
+        _check_workers(args.workers)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('The API server needs uvicorn: pip install "uvicorn[standard]"')
+
+    logging.basicConfig(level=os.getenv("RAINCHECK_LOG_LEVEL", "WARNING").upper())
+    # Worker processes read it back as WORKERS
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers,
+                log_level="warning", access_log=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Load test for the JSON API (api_server.py) against the stub OpenWeather API.
+
+Starts the stub API in this process and the API server under uvicorn in a
+separate process, on a disposable SQLite database unless --database-url is
+given. Every city is requested once to warm the cache, then --connections
+keep-alive connections send requests for --duration seconds. The report
+covers throughput, latency percentiles, response statuses and upstream calls.
+
+--revalidate sends If-None-Match with the last ETag seen for a city, so most
+responses are 304s; --gzip asks for compressed responses; --bulk N requests N
+cities per call from /weather/bulk.
+
+Usage: python benchmarks/api_load_test.py --workers 2 --connections 64 --duration 10
+       python benchmarks/api_load_test.py --revalidate --gzip --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from stub_server import start_stub_server
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1] if len(samples) > 1 else samples[0]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"API server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("API server did not start in time")
+
+async def read_response(reader):
+    """(status, headers) of one HTTP/1.1 response, with its body consumed"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers
+
+async def connection(host, port, paths, args, stop_at, rng, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    try:
+        while time.perf_counter() < stop_at:
+            path = rng.choice(paths)
+            headers = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if args.gzip:
+                headers += "Accept-Encoding: gzip\r\n"
+            if args.revalidate and path in etags:
+                headers += f"If-None-Match: {etags[path]}\r\n"
+            start = time.perf_counter()
+            writer.write((headers + "\r\n").encode())
+            status, response_headers = await read_response(reader)
+            results["latencies"].append((time.perf_counter() - start) * 1000)
+            results["statuses"][status] += 1
+            if "etag" in response_headers:
+                etags[path] = response_headers["etag"]
+    finally:
+        writer.close()
+
+async def run_load(host, port, paths, args):
+    results = {"latencies": [], "statuses": Counter()}
+    stop_at = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        connection(host, port, paths, args, stop_at, random.Random(args.seed * 100003 + i), results)
+        for i in range(args.connections)
+    ))
+    return results, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load after warm-up")
+    parser.add_argument("--cities", type=int, default=30, help="number of distinct cities")
+    parser.add_argument("--bulk", type=int, default=0, help="cities per /weather/bulk request (0 = single-city requests)")
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with the last ETag seen")
+    parser.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per upstream call in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed for request order")
+    parser.add_argument("--min-rps", type=float, default=0, help="fail the run below this throughput")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="disposable database; defaults to a temporary SQLite file")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    server, api_root = start_stub_server(latency=args.latency, seed=args.seed)
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'api_load_test.db')}"
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "OPENWEATHER_API_ROOT": api_root,
+        "OPENWEATHER_API_KEY": os.getenv("OPENWEATHER_API_KEY", "stub"),
+        "OPENWEATHER_CALLS_PER_MINUTE": "0",
+    }
+    subprocess.run([sys.executable, "database.py", "init"], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "api_server.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}/healthz", process)
+        cities = [f"Loadtown {i}" for i in range(args.cities)]
+        if args.bulk:
+            rng = random.Random(args.seed)
+            paths = ["/weather/bulk?" + urllib.parse.urlencode({"city": ",".join(rng.sample(cities, min(args.bulk, len(cities))))})
+                     for _ in range(64)]
+        else:
+            paths = ["/weather?" + urllib.parse.urlencode({"city": city}) for city in cities]
+        # Warm every worker's cache; each worker fills its own memory from the shared database
+        for _ in range(args.workers * 4):
+            for path in paths:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=30):
+                    pass
+
+        results, elapsed = asyncio.run(run_load("127.0.0.1", port, paths, args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        server.shutdown()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    latencies = results["latencies"]
+    report = {
+        "workers": args.workers,
+        "connections": args.connections,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+        } if latencies else None,
+        "statuses": {str(status): count for status, count in sorted(results["statuses"].items())},
+        "upstream_calls": dict(server.calls),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        mode = f"bulk x{args.bulk}" if args.bulk else "single city"
+        print(f"{report['requests']} {mode} requests over {args.connections} connections to {args.workers} worker(s) in {elapsed:.2f}s")
+        print(f"throughput {report['throughput_rps']} req/s  statuses {report['statuses']}")
+        if latencies:
+            lat = report["latency_ms"]
+            print(f"latency ms: p50 {lat['p50']:.2f}  p95 {lat['p95']:.2f}  p99 {lat['p99']:.2f}  max {lat['max']:.2f}")
+        print("upstream calls:", report["upstream_calls"])
+    failed = sum(count for status, count in results["statuses"].items() if status >= 400)
+    if failed or report["throughput_rps"] < args.min_rps:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Cold-miss fetch latency: sequential one-shot requests vs pooled concurrent fetch.
+
+Usage: python benchmarks/bench_fetch.py [--latency 0.1] [--rounds 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Measure raw fetch latency, not the client's rate limiter
+os.environ.setdefault("OPENWEATHER_CALLS_PER_MINUTE", "0")
+
+import requests
+from stub_server import start_stub_server
+from openweather_client import OpenWeatherClient
+
+def sequential_fetch(api_root, lat, lon):
+    """The previous fetch path: two back-to-back requests, no connection reuse"""
+    params = {"lat": lat, "lon": lon, "appid": "stub", "units": "metric"}
+    current = requests.get(f"{api_root}/data/2.5/weather", params=params).json()
+    forecast = requests.get(f"{api_root}/data/2.5/forecast", params=params).json()
+    return current, forecast
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per request in seconds")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    server, api_root = start_stub_server(latency=args.latency)
+    client = OpenWeatherClient("stub", api_root=api_root)
+
+    results = {
+        "sequential": timed(lambda: sequential_fetch(api_root, -26.2, 28.0), args.rounds),
+        "concurrent": timed(lambda: client.current_and_forecast(-26.2, 28.0), args.rounds),
+    }
+    server.shutdown()
+
+    print(f"stub latency {args.latency * 1000:.0f} ms, {args.rounds} rounds")
+    for name, samples in results.items():
+        print(f"{name:>10}: median {statistics.median(samples):7.1f} ms  max {max(samples):7.1f} ms")
+    speedup = statistics.median(results["sequential"]) / statistics.median(results["concurrent"])
+    print(f"speedup: {speedup:.2f}x")
+
+if __name__ == "__main__":
+    main()
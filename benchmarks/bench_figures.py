@@ -0,0 +1,63 @@
+"""Chart construction time with and without the figure cache.
+
+"uncached" builds the figure through Plotly on every call, as before the
+cache existed; "cold" is the first render of a forecast (build plus caching
+its JSON); "warm" replays the cached JSON, as every later rerun does. All
+timings include the to_dict/to_json work st.plotly_chart performs.
+
+Usage: python benchmarks/bench_figures.py [--rounds 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+import plotly.io as pio
+from visualization import (
+    create_hourly_temp_chart, create_daily_temp_chart, clear_figure_cache,
+    _build_hourly_temp_chart, _build_daily_temp_chart,
+)
+
+HOURLY = pd.DataFrame({
+    'hour': ['00:00', '03:00', '06:00', '09:00', '12:00', '15:00', '18:00', '21:00'],
+    'temp': [14.2, 13.1, 15.8, 19.4, 22.7, 21.9, 18.3, 16.0],
+})
+DAILY = pd.DataFrame({
+    'day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
+    'temp_day': [22.1, 24.3, 19.8, 21.0, 23.5],
+    'temp_night': [11.2, 12.5, 10.1, 9.8, 12.0],
+})
+
+def streamlit_serialize(fig):
+    return pio.to_json(fig.to_dict(), validate=False)
+
+def timed(rounds, fn, cold):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if cold:
+            clear_figure_cache()
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    charts = [
+        ("hourly", create_hourly_temp_chart, _build_hourly_temp_chart, HOURLY),
+        ("daily", create_daily_temp_chart, _build_daily_temp_chart, DAILY),
+    ]
+    for name, create, build, df in charts:
+        streamlit_serialize(create(df))  # warm up imports and validators
+        uncached = timed(args.rounds, lambda: streamlit_serialize(build(df)), cold=False)
+        cold = timed(args.rounds, lambda: streamlit_serialize(create(df)), cold=True)
+        warm = timed(args.rounds, lambda: streamlit_serialize(create(df)), cold=False)
+        print(f"{name:>6}: uncached {uncached:6.2f} ms  cold {cold:6.2f} ms  warm {warm:6.2f} ms  "
+              f"({uncached / warm:.1f}x faster than uncached)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Forecast processing: legacy per-item loops vs the columnar pipeline.
+
+Turns thousands of synthetic forecast payloads, one at a time as the app
+does on every cache write, into the hourly and daily columns stored in the
+compact cache payload. Both sides build the same columns; the legacy side
+uses the old per-item datetime loops, with days in the server's timezone
+and each day's condition taken from a single item.
+
+Usage: python benchmarks/bench_forecast.py [--payloads 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stub_server import _forecast_payload
+from forecast_processing import forecast_frame, hourly_columns, daily_columns
+
+def legacy_daily(forecast_list):
+    """The previous WeatherService._process_daily_from_forecast"""
+    daily_data = []
+    current_date = None
+    daily_temps_max = []
+    daily_temps_min = []
+    last_dt = None
+    for item in forecast_list:
+        date = datetime.fromtimestamp(item['dt']).date()
+        if date != current_date:
+            if current_date:
+                daily_data.append({'dt': last_dt, 'main': {'temp_max': max(daily_temps_max), 'temp_min': min(daily_temps_min)}, 'weather': item['weather']})
+                daily_temps_max = []
+                daily_temps_min = []
+            current_date = date
+        last_dt = item['dt']
+        daily_temps_max.append(item['main']['temp_max'])
+        daily_temps_min.append(item['main']['temp_min'])
+        if len(daily_data) >= 7:
+            break
+    if current_date and daily_temps_max and daily_temps_min:
+        daily_data.append({'dt': last_dt, 'main': {'temp_max': max(daily_temps_max), 'temp_min': min(daily_temps_min)}, 'weather': item['weather']})
+    return daily_data
+
+def legacy(payload):
+    hourly_items = payload['list'][:8]
+    hourly = {
+        'dt': [item['dt'] for item in hourly_items],
+        'hour': [datetime.fromtimestamp(item['dt']).strftime('%H:%M') for item in hourly_items],
+        'temp': [round(item['main']['temp'], 1) for item in hourly_items],
+        'condition': [item['weather'][0]['main'] for item in hourly_items],
+        'description': [item['weather'][0]['description'] for item in hourly_items],
+    }
+    daily_items = legacy_daily(payload['list'])
+    daily = {
+        'dt': [item['dt'] for item in daily_items],
+        'day': [datetime.fromtimestamp(item['dt']).strftime('%A') for item in daily_items],
+        'temp_day': [round(item['main']['temp_max'], 1) for item in daily_items],
+        'temp_night': [round(item['main']['temp_min'], 1) for item in daily_items],
+        'condition': [item['weather'][0]['main'] for item in daily_items],
+        'description': [item['weather'][0]['description'] for item in daily_items],
+    }
+    return hourly, daily
+
+def columnar(payload):
+    frame = forecast_frame(payload['list'])
+    tz_offset = payload['city']['timezone']
+    return hourly_columns(frame, tz_offset), daily_columns(frame, tz_offset)
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {elapsed * 1000:8.1f} ms total  {elapsed / count * 1e6:8.1f} us/payload")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=2000)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    payloads = [_forecast_payload(0.0, 0.0, now + i * 600) for i in range(args.payloads)]
+
+    print(f"{args.payloads} payloads x {len(payloads[0]['list'])} forecast steps")
+    base = timed("legacy loops", lambda: [legacy(p) for p in payloads], args.payloads)
+    new = timed("columnar", lambda: [columnar(p) for p in payloads], args.payloads)
+    print(f"speedup {base / new:.2f}x")
+
+if __name__ == "__main__":
+    main()
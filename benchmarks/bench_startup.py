@@ -0,0 +1,67 @@
+"""Cold-start import cost of the app's modules, measured with -X importtime.
+
+Each module is imported in a fresh interpreter. The report shows the total
+import time and which heavy third-party packages got pulled in, so eager
+imports creeping back onto the startup path show up as a regression.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODULES = ["database", "weather_service", "visualization", "cache_warmer"]
+
+# Packages that should only load once a page actually needs them
+HEAVY = ["pandas", "numpy", "plotly", "streamlit", "sqlalchemy"]
+
+def import_profile(module):
+    """Return (total microseconds, set of top-level packages imported)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "postgresql://localhost/unused")},
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"importing {module} failed: {errors[-1] if errors else result.returncode}")
+    total = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        packages.add(name.strip().split(".")[0])
+        if name == " " + module:  # top level, not a nested import
+            total = int(fields[1])
+    return total, packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        results[module] = {
+            "median_ms": statistics.median(total for total, _ in runs) / 1000,
+            "heavy": sorted(set(HEAVY) & runs[0][1]),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for module, result in results.items():
+        heavy = ", ".join(result["heavy"]) or "none"
+        print(f"{module:>16}: {result['median_ms']:7.1f} ms   heavy imports: {heavy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Concurrent-user load test for WeatherService against the stub OpenWeather API.
+
+Runs against a disposable database: --database-url (or DATABASE_URL) for a
+local Postgres, otherwise a fresh SQLite file in a temporary directory. Each
+simulated user builds its own WeatherService and requests random cities; the
+report covers latency percentiles, throughput, upstream calls per endpoint,
+database statements by kind, and whether all pooled connections were returned.
+Runs are reproducible for a given --seed.
+
+Usage: DB_POOL_SIZE=10 DB_MAX_OVERFLOW=20 python benchmarks/load_test.py --users 60
+       python benchmarks/load_test.py --error-rate 0.05 --max-error-rate 0.01 --json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stub_server import start_stub_server
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1] if len(samples) > 1 else samples[0]
+
+def count_statements(engine):
+    """Count statements sent to the database, by leading SQL keyword"""
+    from sqlalchemy import event
+
+    counts = Counter()
+    lock = threading.Lock()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        with lock:
+            counts[kind] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=60, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=20, help="requests per user")
+    parser.add_argument("--cities", type=int, default=30, help="number of distinct cities")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per upstream call in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls the stub fails with 503")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="fail the run above this fraction of failed requests")
+    parser.add_argument("--quota", type=int, default=0, help="stub calls per minute before it answers 429 (0 = unlimited)")
+    parser.add_argument("--calls-per-minute", type=float, default=0, help="client-side upstream rate limit (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for city choice and stub errors")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="disposable database; defaults to a temporary SQLite file")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    server, api_root = start_stub_server(latency=args.latency, error_rate=args.error_rate, seed=args.seed, quota=args.quota)
+    os.environ["OPENWEATHER_API_ROOT"] = api_root
+    os.environ["OPENWEATHER_CALLS_PER_MINUTE"] = str(args.calls_per_minute)
+    os.environ.setdefault("OPENWEATHER_API_KEY", "stub")
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'load_test.db')}"
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from database import get_engine, get_pool_metrics, init_db
+    from history_writer import close_history_writer, get_history_writer_stats
+    from weather_service import WeatherService
+
+    init_db()
+    # The forecast pipeline is imported on first use; keep that one-off cost out of the numbers
+    import forecast_processing  # noqa: F401
+    statements = count_statements(get_engine())
+
+    cities = [f"Loadtown {i}" for i in range(args.cities)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    peak_checked_out = 0
+    done = threading.Event()
+
+    def sample_pool():
+        nonlocal peak_checked_out
+        while not done.is_set():
+            peak_checked_out = max(peak_checked_out, get_pool_metrics()["checked_out"])
+            time.sleep(0.005)
+
+    def user(seed):
+        rng = random.Random(seed)
+        service = WeatherService()
+        for _ in range(args.requests):
+            city = rng.choice(cities)
+            start = time.perf_counter()
+            try:
+                data = service.get_weather_data(city)
+                if not (data["current"] and data["hourly"] and data["daily"]):
+                    raise AssertionError(f"incomplete response for {city}")
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    sampler = threading.Thread(target=sample_pool, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=user, args=(args.seed * 100003 + i,)) for i in range(args.users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    server.shutdown()
+    close_history_writer()
+
+    pool = get_pool_metrics()
+    total = args.users * args.requests
+    report = {
+        "users": args.users,
+        "requests": total,
+        "cities": args.cities,
+        "database": get_engine().dialect.name,
+        "elapsed_s": round(elapsed, 3),
+        "ok": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+        } if latencies else None,
+        "upstream_calls": dict(server.calls),
+        "db_statements": dict(statements),
+        "search_history": get_history_writer_stats(),
+        "pool": {**pool, "peak_checked_out": peak_checked_out},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.users} users x {args.requests} requests over {args.cities} cities on {report['database']} in {elapsed:.2f}s")
+        print(f"ok {report['ok']}  errors {report['errors']}  throughput {report['throughput_rps']} req/s")
+        if latencies:
+            lat = report["latency_ms"]
+            print(f"latency ms: p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+        print("upstream calls:", report["upstream_calls"])
+        print(f"db statements: {sum(statements.values())} {dict(statements)}")
+        print(f"pool: peak checked out {peak_checked_out}  after run {pool}")
+        if errors:
+            print("first error:", errors[0])
+    if tmpdir is not None:
+        get_engine().dispose()
+        tmpdir.cleanup()
+    if len(errors) > args.max_error_rate * total or pool["checked_out"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Local stand-in for the OpenWeather endpoints used by Rain Check.
+
+Run standalone with ``python benchmarks/stub_server.py --port 8081 --latency 0.1``
+or start it in-process with ``start_stub_server()``.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def _current_payload(lat, lon, now):
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "main": {"temp": 21.4, "feels_like": 20.9, "temp_min": 19.8, "temp_max": 23.1, "pressure": 1018, "humidity": 48},
+        "wind": {"speed": 3.6, "deg": 140},
+        "dt": now,
+        "timezone": 7200,
+        "name": "Stubville",
+    }
+
+def _forecast_payload(lat, lon, now):
+    items = []
+    for i in range(40):
+        temp = 15 + 8 * ((i % 8) / 7)
+        items.append({
+            "dt": now + i * 3 * 3600,
+            "main": {"temp": round(temp, 2), "temp_min": round(temp - 1.5, 2), "temp_max": round(temp + 1.5, 2), "pressure": 1016, "humidity": 55},
+            "weather": [{"id": 500 if i % 5 == 0 else 800, "main": "Rain" if i % 5 == 0 else "Clear",
+                         "description": "light rain" if i % 5 == 0 else "clear sky", "icon": "01d"}],
+            "wind": {"speed": 4.1, "deg": 200},
+        })
+    return {"cod": "200", "cnt": 40, "list": items, "city": {"name": "Stubville", "coord": {"lat": lat, "lon": lon}, "timezone": 7200}}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with server.lock:
+            server.calls[url.path] += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.quota:
+            # Fixed one-minute windows, like OpenWeather's per-minute limit
+            with server.lock:
+                window = int(time.time() // 60)
+                if window != server.window:
+                    server.window, server.window_calls = window, 0
+                server.window_calls += 1
+                over_quota = server.window_calls > server.quota
+            if over_quota:
+                with server.lock:
+                    server.calls["429"] += 1
+                retry_after = max(1, int(60 - time.time() % 60))
+                return self._send(429, {"cod": 429, "message": "stub quota exceeded"}, {"Retry-After": str(retry_after)})
+
+        if server.error_rate and server.rng.random() < server.error_rate:
+            return self._send(503, {"cod": 503, "message": "stub error"})
+
+        now = int(time.time())
+        if url.path == "/geo/1.0/direct":
+            city = query.get("q", "")
+            lat = (sum(map(ord, city)) % 180) - 90.0
+            lon = (sum(map(ord, city[::-1])) % 360) - 180.0
+            return self._send(200, [{"name": city, "lat": lat, "lon": lon, "country": "ZZ"}])
+        if url.path == "/data/2.5/weather":
+            return self._send(200, _current_payload(float(query.get("lat", 0)), float(query.get("lon", 0)), now))
+        if url.path == "/data/2.5/forecast":
+            return self._send(200, _forecast_payload(float(query.get("lat", 0)), float(query.get("lon", 0)), now))
+        return self._send(404, {"cod": 404, "message": "not found"})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_server(port=0, latency=0.0, error_rate=0.0, seed=0, quota=0):
+    """Start the stub in a daemon thread; returns (server, api_root)
+
+    quota > 0 answers calls beyond that many per minute with 429 and a
+    Retry-After header.
+    """
+    import random
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.quota = quota
+    server.window = None
+    server.window_calls = 0
+    server.calls = Counter()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenWeather server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--quota", type=int, default=0, help="calls per minute before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+    server, api_root = start_stub_server(args.port, args.latency, args.error_rate, quota=args.quota)
+    print(f"Stub OpenWeather API listening on {api_root}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
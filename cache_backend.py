@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from cache_codec import FORMAT_VERSION, compact_from_legacy, decode_payload
+
+# Which persistent cache sits behind the in-process one: "postgres" (the
+# DATABASE_URL database), "sqlite" (a local file, for single-node installs)
+# or "memory" (per process, for tests)
+CACHE_BACKEND = os.getenv("WEATHER_CACHE_BACKEND", "postgres")
+CACHE_PATH = os.getenv("WEATHER_CACHE_PATH", "weather_cache.db")
+
+_EPOCH = datetime(1970, 1, 1)
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_CHUNK = 500
+
+
+class CacheBackend:
+    """Persistent weather cache behind the in-process L1
+
+    Rows are dicts with city, lat, lon, payload (encoded by cache_codec),
+    format_version and timestamp (naive UTC). Reads return decoded compact
+    payloads; entries that cannot be decoded are reported as misses.
+    """
+
+    name = "base"
+
+    def get(self, key, max_age):
+        """Return (payload, fetched_at) for a cached city younger than max_age, or None"""
+        return self.get_many([key], max_age).get(key)
+
+    def get_many(self, keys, max_age):
+        """Return {key: (payload, fetched_at)} for the cached cities younger than max_age"""
+        raise NotImplementedError
+
+    def put_many(self, rows):
+        """Insert or replace cached weather rows"""
+        raise NotImplementedError
+
+    def purge(self, max_age):
+        """Delete entries older than max_age; returns the number removed"""
+        raise NotImplementedError
+
+    def get_location(self, key):
+        """Return cached (lat, lon) for a city, or None"""
+        raise NotImplementedError
+
+    def put_location(self, key, lat, lon):
+        raise NotImplementedError
+
+def _decode(blob):
+    try:
+        return decode_payload(blob)
+    except Exception:
+        # Unreadable payloads are treated as a miss and overwritten by the refetch
+        return None
+
+class PostgresCacheBackend(CacheBackend):
+    """WeatherCache and GeocodeCache tables in the DATABASE_URL database
+
+    get_many and put_many take an optional session so callers can run them
+    inside their own transaction, e.g. under an advisory lock. The database
+    module, and with it SQLAlchemy, is imported on first use.
+    """
+
+    name = "postgres"
+
+    def get_many(self, keys, max_age, db=None):
+        from database import session_scope, WeatherCache
+
+        if db is None:
+            with session_scope() as db:
+                return self.get_many(keys, max_age, db)
+        query = db.query(WeatherCache).filter(WeatherCache.timestamp > datetime.utcnow() - max_age)
+        if len(keys) == 1:
+            cached_rows = query.filter(WeatherCache.city == keys[0]).all()
+        else:
+            cached_rows = query.filter(WeatherCache.city.in_(keys)).all()
+        entries = {}
+        for row in cached_rows:
+            if row.payload is not None:
+                payload = _decode(row.payload)
+            else:
+                # Rows written before the compact format was introduced
+                try:
+                    payload = compact_from_legacy(row.current_data, row.hourly_data, row.daily_data)
+                except Exception:
+                    payload = None
+            if payload is not None:
+                entries[row.city] = (payload, row.timestamp)
+        return entries
+
+    def put_many(self, rows, db=None):
+        from database import session_scope, upsert_weather_cache
+
+        if db is None:
+            with session_scope() as db:
+                upsert_weather_cache(db, rows)
+                db.commit()
+        else:
+            # The caller commits, e.g. releasing its advisory lock at the same time
+            with db.begin_nested():
+                upsert_weather_cache(db, rows)
+
+    def purge(self, max_age):
+        from database import session_scope, purge_weather_cache
+
+        with session_scope() as db:
+            return purge_weather_cache(db, max_age)
+
+    def get_location(self, key):
+        from database import session_scope, GeocodeCache
+
+        with session_scope() as db:
+            cached_location = db.get(GeocodeCache, key)
+            return (cached_location.lat, cached_location.lon) if cached_location else None
+
+    def put_location(self, key, lat, lon):
+        from database import session_scope, GeocodeCache
+
+        with session_scope() as db:
+            db.merge(GeocodeCache(city=key, lat=lat, lon=lon))
+            db.commit()
+
+class SQLiteCacheBackend(CacheBackend):
+    """Local SQLite file in WAL mode, for single-node installs
+
+    Each thread keeps its own connection; reads go through a memory-mapped
+    file and never wait on the writer.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache ("
+                "city TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, "
+                "payload BLOB NOT NULL, format_version INTEGER NOT NULL, timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_weather_cache_timestamp ON weather_cache (timestamp)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "city TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, timestamp REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys, max_age):
+        conn = self._connection()
+        cutoff = (datetime.utcnow() - max_age - _EPOCH).total_seconds()
+        entries = {}
+        for start in range(0, len(keys), _SQLITE_CHUNK):
+            chunk = keys[start:start + _SQLITE_CHUNK]
+            cursor = conn.execute(
+                "SELECT city, payload, timestamp FROM weather_cache "
+                f"WHERE city IN ({','.join('?' * len(chunk))}) AND timestamp > ? AND format_version = ?",
+                [*chunk, cutoff, FORMAT_VERSION],
+            )
+            for city, blob, timestamp in cursor:
+                payload = _decode(blob)
+                if payload is not None:
+                    entries[city] = (payload, _EPOCH + timedelta(seconds=timestamp))
+        return entries
+
+    def put_many(self, rows):
+        if not rows:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO weather_cache (city, lat, lon, payload, format_version, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (city) DO UPDATE SET "
+                "lat = excluded.lat, lon = excluded.lon, payload = excluded.payload, "
+                "format_version = excluded.format_version, timestamp = excluded.timestamp",
+                [(row["city"], row["lat"], row["lon"], row["payload"], row["format_version"],
+                  (row["timestamp"] - _EPOCH).total_seconds()) for row in rows],
+            )
+
+    def purge(self, max_age):
+        cutoff = (datetime.utcnow() - max_age - _EPOCH).total_seconds()
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM weather_cache WHERE timestamp < ?", (cutoff,)).rowcount
+
+    def get_location(self, key):
+        row = self._connection().execute("SELECT lat, lon FROM geocode_cache WHERE city = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def put_location(self, key, lat, lon):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (city, lat, lon, timestamp) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, (datetime.utcnow() - _EPOCH).total_seconds()),
+            )
+
+class MemoryCacheBackend(CacheBackend):
+    """Process-local dicts; nothing survives a restart"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._rows = {}
+        self._locations = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys, max_age):
+        cutoff = datetime.utcnow() - max_age
+        entries = {}
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+        for row in rows:
+            if row and row["timestamp"] > cutoff and row["format_version"] == FORMAT_VERSION:
+                payload = _decode(row["payload"])
+                if payload is not None:
+                    entries[row["city"]] = (payload, row["timestamp"])
+        return entries
+
+    def put_many(self, rows):
+        with self._lock:
+            for row in rows:
+                self._rows[row["city"]] = dict(row)
+
+    def purge(self, max_age):
+        cutoff = datetime.utcnow() - max_age
+        with self._lock:
+            expired = [key for key, row in self._rows.items() if row["timestamp"] < cutoff]
+            for key in expired:
+                del self._rows[key]
+        return len(expired)
+
+    def get_location(self, key):
+        return self._locations.get(key)
+
+    def put_location(self, key, lat, lon):
+        self._locations[key] = (lat, lon)
+
+BACKENDS = {
+    "postgres": PostgresCacheBackend,
+    "sqlite": SQLiteCacheBackend,
+    "memory": MemoryCacheBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_cache_backend(name=CACHE_BACKEND, **kwargs):
+    """Build a cache backend by name"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown cache backend '{name}'; expected one of {', '.join(BACKENDS)}")
+    return backend_class(**kwargs)
+
+def get_cache_backend():
+    """The process-wide cache backend selected by WEATHER_CACHE_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+    return _backend
@@ -0,0 +1,95 @@
+import json
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # optional; JSON is used when msgpack is not installed
+    msgpack = None
+
+# Bump when the shape of the compact payload changes
+FORMAT_VERSION = 1
+
+# Payloads larger than this are zlib-compressed
+COMPRESS_THRESHOLD = 1024
+
+_MAGIC = b"RC"
+_HEADER = struct.Struct("!2sBB")  # magic, format version, flags
+_FLAG_MSGPACK = 0x01
+_FLAG_ZLIB = 0x02
+
+
+def compact_current(current_data):
+    """Keep only the current-weather fields the UI renders"""
+    weather = current_data["weather"][0]
+    return {
+        "dt": current_data.get("dt"),
+        "timezone": current_data.get("timezone", 0),
+        "condition": weather["main"],
+        "description": weather["description"],
+        "temp": round(current_data["main"]["temp"], 1),
+        "humidity": current_data["main"]["humidity"],
+        "pressure": current_data["main"]["pressure"],
+        "wind_speed": current_data["wind"]["speed"],
+    }
+
+def compact_payload(current_data, forecast_list, tz_offset=0):
+    """Build the compact cache payload from raw API responses
+
+    Hourly and daily forecasts are stored already aggregated, as columns.
+    """
+    # NumPy is only needed when writing, so keep it off the read path
+    from forecast_processing import forecast_frame, hourly_columns, daily_columns
+
+    frame = forecast_frame(forecast_list)
+    return {
+        "current": compact_current(current_data),
+        "hourly": hourly_columns(frame, tz_offset),
+        "daily": daily_columns(frame, tz_offset),
+    }
+
+def compact_from_legacy(current_data, hourly_data, daily_data):
+    """Convert a legacy raw-JSON cache row into the compact payload"""
+    from forecast_processing import forecast_frame, hourly_columns, daily_columns
+
+    tz_offset = current_data.get("timezone", 0)
+    return {
+        "current": compact_current(current_data),
+        "hourly": hourly_columns(forecast_frame(hourly_data), tz_offset),
+        "daily": daily_columns(forecast_frame(daily_data), tz_offset),
+    }
+
+def encode_payload(payload, compress=None):
+    """Serialize a compact payload to bytes with a small versioned header
+
+    compress=None compresses only payloads above COMPRESS_THRESHOLD.
+    """
+    flags = 0
+    if msgpack is not None:
+        body = msgpack.packb(payload, use_bin_type=True)
+        flags |= _FLAG_MSGPACK
+    else:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+    if compress or (compress is None and len(body) > COMPRESS_THRESHOLD):
+        body = zlib.compress(body, 6)
+        flags |= _FLAG_ZLIB
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION, flags) + body
+
+def decode_payload(blob):
+    """Deserialize bytes written by encode_payload
+
+    Raises ValueError for unknown or outdated formats, which callers treat as
+    a cache miss.
+    """
+    blob = bytes(blob)
+    magic, version, flags = _HEADER.unpack_from(blob)
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache payload format {version}")
+    body = blob[_HEADER.size:]
+    if flags & _FLAG_ZLIB:
+        body = zlib.decompress(body)
+    if flags & _FLAG_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Cache payload needs msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
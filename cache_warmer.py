@@ -0,0 +1,182 @@
+"""Background refresher that keeps popular cities warm in the weather cache.
+
+Run it as a standalone worker:
+
+    python cache_warmer.py            # refresh forever, every --interval seconds
+    python cache_warmer.py --once     # single refresh pass, e.g. from cron
+    python cache_warmer.py --purge    # only delete expired cache entries and old search history
+
+or inside the Streamlit process by setting RAINCHECK_WARM_IN_PROCESS=1.
+"""
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from cities import POPULAR_CITIES, normalize_city
+from database import database_configured, session_scope, purge_observations, purge_search_history, top_searched_cities
+from metrics import start_metrics_server
+from rate_limiter import BACKGROUND, TokenBucket, priority_scope
+from weather_service import WeatherService, CACHE_TTL, RATE_LIMIT_FALLBACK_AGE
+
+logger = logging.getLogger(__name__)
+
+# Refresh a few minutes before entries expire so visitors never see a miss
+DEFAULT_INTERVAL = CACHE_TTL.total_seconds() - 5 * 60
+
+# OpenWeather's free tier allows 60 calls/minute; leave headroom for users
+DEFAULT_CALLS_PER_MINUTE = 40
+
+# Each refresh costs a current weather and a forecast call
+CALLS_PER_REFRESH = 2
+
+# Besides the popular cities, warm the most searched ones of the last day
+TRENDING_CITIES = int(os.getenv("RAINCHECK_WARM_TRENDING", "20"))
+TRENDING_WINDOW = timedelta(hours=24)
+
+class CacheWarmer:
+    """Periodically re-fetch a list of cities with bounded concurrency
+
+    Without an explicit list, each pass warms the popular cities plus the
+    trending_cities most searched in the last day, read from the search rollups.
+    """
+
+    def __init__(self, cities=None, interval=DEFAULT_INTERVAL, max_workers=4,
+                 calls_per_minute=DEFAULT_CALLS_PER_MINUTE, jitter=2.0, trending_cities=TRENDING_CITIES):
+        self.cities = list(cities) if cities is not None else None
+        self.trending_cities = trending_cities
+        self.interval = interval
+        self.max_workers = max_workers
+        self.jitter = jitter
+        self.limiter = TokenBucket(rate=calls_per_minute / 60.0, capacity=CALLS_PER_REFRESH * 2)
+        self.service = WeatherService()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _refresh_city(self, city):
+        """Refresh a single city, spreading requests out with random jitter"""
+        if self._stop.wait(random.uniform(0, self.jitter)):
+            return False
+        self.limiter.acquire(CALLS_PER_REFRESH)
+        try:
+            # Users' own fetches are served ahead of the warmer's
+            with priority_scope(BACKGROUND):
+                self.service.get_weather_data(city, force_refresh=True, record_history=False)
+            return True
+        except Exception as e:
+            logger.warning("Cache warmer failed to refresh %s: %s", city, e)
+            return False
+
+    def trending(self):
+        """Most searched normalized cities of the last TRENDING_WINDOW"""
+        if not self.trending_cities or not database_configured():
+            return []
+        try:
+            with session_scope() as db:
+                since = datetime.utcnow() - TRENDING_WINDOW
+                return [city for city, _ in top_searched_cities(db, since, self.trending_cities)]
+        except Exception:
+            logger.exception("Cache warmer failed to read search trends")
+            return []
+
+    def cities_to_warm(self):
+        """The cities for the next pass, without duplicates that share a cache key"""
+        if self.cities is not None:
+            return self.cities
+        cities = {}
+        for city in POPULAR_CITIES + self.trending():
+            cities.setdefault(normalize_city(city), city)
+        return list(cities.values())
+
+    def run_once(self, cities=None):
+        """Refresh every city once; returns the number refreshed successfully"""
+        cities = cities if cities is not None else self.cities_to_warm()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cache-warmer") as executor:
+            return sum(executor.map(self._refresh_city, cities))
+
+    def purge_expired(self):
+        """Delete expired cache rows, and search history and hourly observations past retention; returns rows removed"""
+        purged = 0
+        try:
+            # Entries past CACHE_MAX_AGE are still served while OpenWeather is
+            # rate limiting us, so keep them for the whole fallback window
+            purged += self.service.cache.purge(RATE_LIMIT_FALLBACK_AGE)
+        except Exception:
+            logger.exception("Cache warmer failed to purge expired entries")
+        if not database_configured():
+            return purged
+        try:
+            with session_scope() as db:
+                purged += purge_search_history(db)
+                purged += purge_observations(db)
+        except Exception:
+            logger.exception("Cache warmer failed to prune search history and observations")
+        return purged
+
+    def run_forever(self):
+        """Refresh all cities and purge expired entries every interval until stopped"""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            cities = self.cities_to_warm()
+            refreshed = self.run_once(cities)
+            purged = self.purge_expired()
+            elapsed = time.monotonic() - started
+            logger.info("Cache warmer refreshed %d/%d cities and purged %d expired entries in %.1fs",
+                        refreshed, len(cities), purged, elapsed)
+            self._stop.wait(max(0.0, self.interval - elapsed))
+
+    def start(self):
+        """Run the warmer in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+_background_warmer = None
+_background_lock = threading.Lock()
+
+def start_background_warmer(**kwargs):
+    """Start a single process-wide warmer thread, e.g. from the Streamlit app"""
+    global _background_warmer
+    with _background_lock:
+        if _background_warmer is None:
+            _background_warmer = CacheWarmer(**kwargs).start()
+    return _background_warmer
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep popular cities warm in the weather cache")
+    parser.add_argument("--once", action="store_true", help="run a single refresh pass and exit")
+    parser.add_argument("--purge", action="store_true", help="only delete expired cache entries and exit")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between refresh passes")
+    parser.add_argument("--workers", type=int, default=4, help="maximum concurrent refreshes")
+    parser.add_argument("--calls-per-minute", type=float, default=DEFAULT_CALLS_PER_MINUTE, help="upstream API call budget")
+    parser.add_argument("--jitter", type=float, default=2.0, help="maximum random delay in seconds before each refresh")
+    parser.add_argument("--trending", type=int, default=TRENDING_CITIES, help="also warm this many of the last day's most searched cities")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("RAINCHECK_LOG_LEVEL", "WARNING").upper())
+    start_metrics_server()
+
+    warmer = CacheWarmer(interval=args.interval, max_workers=args.workers,
+                         calls_per_minute=args.calls_per_minute, jitter=args.jitter, trending_cities=args.trending)
+    if args.purge:
+        print(f"Purged {warmer.purge_expired()} expired cache entries and search history rows")
+    elif args.once:
+        cities = warmer.cities_to_warm()
+        refreshed = warmer.run_once(cities)
+        print(f"Refreshed {refreshed}/{len(cities)} cities")
+    else:
+        try:
+            warmer.run_forever()
+        except KeyboardInterrupt:
+            warmer.stop()
+
+if __name__ == "__main__":
+    main()
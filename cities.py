@@ -0,0 +1,11 @@
+# Popular cities offered as suggestions and kept warm in the weather cache
+POPULAR_CITIES = [
+    "Johannesburg", "Cape Town", "Durban", "Pretoria", "Gqeberha (Port Elizabeth)", "Bloemfontein", "East London", "Kimberley", "Polokwane", "Mbombela (Nelspruit)", "Pietermaritzburg",
+    "Rustenburg", "George", "Stellenbosch", "Worcester", "Upington", "Klerksdorp", "Newcastle", "Mthatha", "Vereeniging", "Vanderbijlpark", "Welkom", "Witbank (eMalahleni)",
+    "Beaufort West", "Graaff-Reinet", "Oudtshoorn", "Swellendam", "Paarl", "Springbok", "Vryburg", "Bethlehem", "Harrismith", "Ladysmith", "Richards Bay", "Potchefstroom", "Kroonstad", "Queenstown(Komani)", "Mahikeng(Mafikeng)", "Phalaborwa",
+    "London", "New York", "Tokyo", "Paris", "Sydney", "Dubai"
+]
+
+def normalize_city(city):
+    """Normalize a city name for use as a cache key"""
+    return " ".join(city.split()).casefold()
@@ -0,0 +1,203 @@
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+GAZETTEER_PATH = os.getenv(
+    "RAINCHECK_GAZETTEER", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.tsv")
+)
+
+# Search history is re-counted at most this often for ranking
+POPULARITY_TTL = 600
+POPULARITY_WINDOW = timedelta(days=30)
+
+# Minimum trigram similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.35
+
+# Match quality by kind: whole name, alternate name, word inside a name
+_QUALITY = {0: 2.0, 1: 1.8, 2: 1.4}
+_EXACT_BONUS = 1.0
+
+CityMatch = namedtuple("CityMatch", ["label", "name", "country", "lat", "lon", "population"])
+
+_PARENS = re.compile(r"\(([^)]*)\)")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def fold(text):
+    """Normalize a name for matching: no accents, case or punctuation"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CityIndex:
+    """Prefix and trigram index over the bundled city gazetteer
+
+    The gazetteer file is memory-mapped; the index keeps only normalized
+    names, populations and byte offsets, and reads a row's details from the
+    mapping when it is returned as a match.
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = []
+        self._exact = {}  # folded name -> rows
+        prefix = []  # (folded key, kind, row)
+        self._entry_rows = []
+        self._entry_sizes = []
+        self._postings = {}  # trigram -> entry ids
+
+        offset = 0
+        for line in iter(self._map.readline, b""):
+            start, offset = offset, offset + len(line)
+            if line.startswith(b"#") or not line.strip():
+                continue
+            name, alternates, _ = line.decode("utf-8").split("\t", 2)
+            row = len(self._offsets)
+            self._offsets.append(start)
+            names = [(name, 0)] + [(alt, 1) for alt in alternates.split(",") if alt]
+            for text, kind in names:
+                key = fold(text)
+                self._exact.setdefault(key, []).append(row)
+                prefix.append((key, kind, row))
+                words = key.split(" ")
+                for i in range(1, len(words)):
+                    prefix.append((" ".join(words[i:]), 2, row))
+                self._add_trigrams(key, row)
+
+        prefix.sort()
+        self._prefix_keys = [key for key, _, _ in prefix]
+        self._prefix_entries = [(kind, row) for _, kind, row in prefix]
+
+    def _add_trigrams(self, key, row):
+        entry = len(self._entry_rows)
+        grams = _trigrams(key)
+        self._entry_rows.append(row)
+        self._entry_sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _record(self, row):
+        start = self._offsets[row]
+        end = self._map.find(b"\n", start)
+        line = self._map[start:end if end != -1 else len(self._map)].decode("utf-8")
+        name, _, country, lat, lon, population = line.split("\t")
+        return CityMatch(f"{name}, {country}", name, country, float(lat), float(lon), int(population))
+
+    def _candidates(self, key, limit):
+        """Map rows to their best match quality for a folded query"""
+        quality = {}
+        lo = bisect_left(self._prefix_keys, key)
+        hi = bisect_left(self._prefix_keys, key + "\uffff", lo)
+        for i in range(lo, hi):
+            kind, row = self._prefix_entries[i]
+            score = _QUALITY[kind] + (_EXACT_BONUS if self._prefix_keys[i] == key else 0)
+            if score > quality.get(row, 0):
+                quality[row] = score
+
+        # Fall back to trigram similarity for typos and mid-word matches
+        if len(quality) < limit and len(key) >= 3:
+            grams = _trigrams(key)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            for entry, count in shared.items():
+                similarity = count / (len(grams) + self._entry_sizes[entry] - count)
+                if similarity >= FUZZY_THRESHOLD:
+                    row = self._entry_rows[entry]
+                    quality[row] = max(quality.get(row, 0), similarity * 1.5)
+        return quality
+
+    def search(self, query, limit=8, popularity=None):
+        """Best matches for free text, ranked by match quality, population and search counts
+
+        popularity maps normalized city strings (as searched) to counts.
+        """
+        key = fold(query)
+        if not key:
+            return []
+        popularity = popularity or {}
+        scored = []
+        for row, quality in self._candidates(key, limit).items():
+            match = self._record(row)
+            searches = popularity.get(fold(match.label), 0) + popularity.get(fold(match.name), 0)
+            score = quality + 0.15 * math.log10(1 + match.population) + 0.3 * math.log10(1 + searches)
+            scored.append((score, match))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [match for _, match in scored[:limit]]
+
+    def resolve(self, text):
+        """Coordinates for a city name, optionally "Name, CC", or None when unknown
+
+        Ambiguous names resolve to the most populous city. Names written as
+        "Gqeberha (Port Elizabeth)" are tried with and without the brackets.
+        """
+        name, _, country = text.rpartition(",") if "," in text else (text, "", "")
+        country = country.strip().upper()
+        for candidate in (name, _PARENS.sub(" ", name), *_PARENS.findall(name)):
+            rows = self._exact.get(fold(candidate), [])
+            matches = [self._record(row) for row in rows]
+            if country:
+                matches = [match for match in matches if match.country == country]
+            if matches:
+                best = max(matches, key=lambda match: match.population)
+                return best.lat, best.lon
+        return None
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_city_index():
+    """The process-wide index, built on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CityIndex()
+    return _index
+
+_popularity = {}
+_popularity_loaded = None
+_popularity_lock = threading.Lock()
+
+def get_search_popularity():
+    """Recent search counts by folded city, refreshed every POPULARITY_TTL seconds"""
+    global _popularity, _popularity_loaded
+    if _popularity_loaded is not None and time.monotonic() - _popularity_loaded < POPULARITY_TTL:
+        return _popularity
+    with _popularity_lock:
+        if _popularity_loaded is None or time.monotonic() - _popularity_loaded >= POPULARITY_TTL:
+            try:
+                from database import database_configured, session_scope, count_searches
+
+                counts = {}
+                if database_configured():
+                    with session_scope() as db:
+                        counts = count_searches(db, datetime.utcnow() - POPULARITY_WINDOW)
+                popularity = Counter()
+                for city, count in counts.items():
+                    popularity[fold(city)] += count
+                _popularity = dict(popularity)
+            except Exception:
+                # Rank by population alone until the database is reachable
+                pass
+            _popularity_loaded = time.monotonic()
+    return _popularity
+
+def search_cities(query, limit=8):
+    """Autocomplete suggestions for a partial city name"""
+    return get_city_index().search(query, limit, get_search_popularity())
@@ -1,60 +1,476 @@
+import logging
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 load_dotenv()
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, func, inspect, null, text, Column, Integer, String, Float, DateTime, JSON, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import QueuePool
+from cities import normalize_city
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
 
 # Database connection
 DATABASE_URL = os.getenv('DATABASE_URL')
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=True,
-    connect_args={
-        "sslmode": "require"
-    }
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+# Raw search history is kept this long; rollups outlive it (hourly ones for
+# HOURLY_ROLLUP_RETENTION_DAYS, daily ones indefinitely)
+SEARCH_HISTORY_RETENTION_DAYS = int(os.getenv('SEARCH_HISTORY_RETENTION_DAYS', '30'))
+HOURLY_ROLLUP_RETENTION_DAYS = int(os.getenv('HOURLY_ROLLUP_RETENTION_DAYS', '14'))
+
+# Hourly weather observations are compacted to daily ones after this long
+OBSERVATION_HOURLY_RETENTION_DAYS = int(os.getenv('OBSERVATION_HOURLY_RETENTION_DAYS', '30'))
+
+_EPOCH = datetime(1970, 1, 1)
+
+_unconfigured_warned = False
+
+# The engine is created on first use, so importing this module never
+# touches the network; run `python database.py init` to create the schema
+_engine = None
+_engine_lock = threading.Lock()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+def get_engine():
+    """Create the database engine on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                sqlite = (DATABASE_URL or "").startswith("sqlite")
+                _engine = create_engine(
+                    DATABASE_URL,
+                    poolclass=QueuePool,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                    pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+                    pool_pre_ping=True,
+                    # SQLite is supported for local runs and benchmarks
+                    connect_args={"check_same_thread": False} if sqlite else {
+                        "sslmode": "require"
+                    }
+                )
+                if sqlite:
+                    event.listen(_engine, "connect", _configure_sqlite)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+def database_configured():
+    """Whether DATABASE_URL is set; warns once when it is not
+
+    Without a database the app still serves weather from the cache backend,
+    but search history, observations and search trends are switched off.
+    """
+    global _unconfigured_warned
+    if DATABASE_URL:
+        return True
+    if not _unconfigured_warned:
+        _unconfigured_warned = True
+        logger.warning("DATABASE_URL is not set; search history, weather observations and search trends are disabled")
+    return False
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """Let readers run alongside the writer and wait for locks instead of failing"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 class SearchHistory(Base):
     """Store user search history"""
     __tablename__ = "search_history"
+    __table_args__ = (
+        Index("ix_search_history_timestamp", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+class SearchRollup(Base):
+    """Search counts per normalized city per hour or day, kept current by the history writer"""
+    __tablename__ = "search_rollups"
+    __table_args__ = (
+        Index("ix_search_rollups_period_bucket", "period", "bucket"),
+    )
+
+    period = Column(String, primary_key=True)  # "hour" or "day"
+    bucket = Column(DateTime, primary_key=True)  # start of the hour or day, UTC
+    city = Column(String, primary_key=True)  # normalized city name
+    count = Column(Integer, nullable=False)
+
 class WeatherCache(Base):
-    """Cache weather data to reduce API calls"""
+    """Cache weather data to reduce API calls, one row per normalized city"""
     __tablename__ = "weather_cache"
+    __table_args__ = (
+        Index("uq_weather_cache_city", "city", unique=True),
+        Index("ix_weather_cache_city_timestamp", "city", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    city = Column(String, nullable=False)
+    city = Column(String, nullable=False)  # normalized city name
     lat = Column(Float, nullable=False)
     lon = Column(Float, nullable=False)
-    current_data = Column(JSON)
-    hourly_data = Column(JSON)
-    daily_data = Column(JSON)
+    # Compact, pre-aggregated payload written by cache_codec.encode_payload
+    payload = Column(LargeBinary)
+    format_version = Column(Integer)
+    # Legacy raw API JSON; converted by migrate_cache_payloads and cleared on rewrite
+    current_data = Column(JSON(none_as_null=True))
+    hourly_data = Column(JSON(none_as_null=True))
+    daily_data = Column(JSON(none_as_null=True))
     timestamp = Column(DateTime, default=datetime.utcnow)
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+class GeocodeCache(Base):
+    """Cache city coordinates, which never change, to skip the geocoding API"""
+    __tablename__ = "geocode_cache"
+
+    city = Column(String, primary_key=True)  # normalized city name
+    lat = Column(Float, nullable=False)
+    lon = Column(Float, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+class RateLimitBucket(Base):
+    """Token bucket state shared by every process calling OpenWeather"""
+    __tablename__ = "rate_limit_buckets"
+
+    name = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # epoch seconds, database clock
+
+class WeatherObservation(Base):
+    """Observed weather and the nearest forecast per city, summed into hour and day buckets
+
+    Means are the sums divided by samples (observations) or forecast_samples.
+    """
+    __tablename__ = "weather_observations"
+    __table_args__ = (
+        # Buckets arrive roughly in time order, so on Postgres a tiny BRIN
+        # index serves the retention scans; other databases get a B-tree
+        Index("ix_weather_observations_bucket", "bucket", postgresql_using="brin"),
+    )
+
+    city = Column(String, primary_key=True)  # normalized city name
+    resolution = Column(String, primary_key=True)  # "hour" or "day"
+    bucket = Column(DateTime, primary_key=True)  # start of the hour or day, UTC
+    samples = Column(Integer, nullable=False)
+    temp_sum = Column(Float, nullable=False)
+    temp_min = Column(Float)
+    temp_max = Column(Float)
+    humidity_sum = Column(Float, nullable=False)
+    pressure_sum = Column(Float, nullable=False)
+    wind_speed_sum = Column(Float, nullable=False)
+    forecast_samples = Column(Integer, nullable=False)
+    forecast_temp_sum = Column(Float, nullable=False)
+
+def migrate_weather_cache(bind):
+    """Collapse legacy weather_cache rows to one per city and add its indexes"""
+    indexes = {index["name"] for index in inspect(bind).get_indexes("weather_cache")}
+    if "uq_weather_cache_city" in indexes:
+        return
+    with bind.begin() as conn:
+        conn.execute(text(
+            "UPDATE weather_cache SET city = lower(regexp_replace(btrim(city), '\\s+', ' ', 'g'))"
+        ))
+        # Keep only the newest row for each city
+        conn.execute(text(
+            "DELETE FROM weather_cache a USING weather_cache b "
+            "WHERE a.city = b.city AND (a.timestamp, a.id) < (b.timestamp, b.id)"
+        ))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_weather_cache_city ON weather_cache (city)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_weather_cache_city_timestamp ON weather_cache (city, timestamp)"
+        ))
+
+def migrate_cache_payloads(bind):
+    """Add the compact payload columns and convert legacy raw-JSON cache rows"""
+    from cache_codec import FORMAT_VERSION, compact_from_legacy, encode_payload
+
+    columns = {column["name"] for column in inspect(bind).get_columns("weather_cache")}
+    if "payload" not in columns:
+        with bind.begin() as conn:
+            conn.execute(text("ALTER TABLE weather_cache ADD COLUMN payload BYTEA"))
+            conn.execute(text("ALTER TABLE weather_cache ADD COLUMN format_version INTEGER"))
+
+    with Session(bind) as db:
+        # Rows in an older compact format are cheaper to refetch than to convert
+        db.query(WeatherCache).filter(
+            WeatherCache.payload.isnot(None),
+            WeatherCache.format_version != FORMAT_VERSION
+        ).delete(synchronize_session=False)
 
-def get_db():
-    """Get database session with error handling"""
-    db = None
+        legacy_rows = db.query(WeatherCache).filter(WeatherCache.payload.is_(None)).all()
+        for row in legacy_rows:
+            try:
+                row.payload = encode_payload(compact_from_legacy(row.current_data, row.hourly_data, row.daily_data))
+                row.format_version = FORMAT_VERSION
+                row.current_data = row.hourly_data = row.daily_data = None
+            except Exception:
+                # Unconvertible rows are just cache misses
+                db.delete(row)
+        db.commit()
+        return len(legacy_rows)
+
+def migrate_search_history(bind):
+    """Index raw search history by time and build rollups for rows written before them"""
+    with bind.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_search_history_timestamp ON search_history (timestamp)"))
+
+    with Session(bind) as db:
+        if db.query(SearchRollup.city).first() is not None:
+            return
+        counts = {}
+        query = db.query(SearchHistory.city, SearchHistory.timestamp).execution_options(yield_per=10000)
+        for city, timestamp in query:
+            if timestamp is not None:
+                for key in _rollup_keys(city, timestamp):
+                    counts[key] = counts.get(key, 0) + 1
+        increment_search_rollups(db, counts)
+        db.commit()
+
+def init_db():
+    """Create all tables and apply migrations to existing ones"""
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    migrate_weather_cache(engine)
+    migrate_search_history(engine)
+    return migrate_cache_payloads(engine)
+
+def _insert_for(db):
+    return sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+
+def upsert_weather_cache(db, rows):
+    """Insert or replace cached weather rows, keyed by normalized city"""
+    if not rows:
+        return
+    stmt = _insert_for(db)(WeatherCache).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WeatherCache.city],
+        set_={
+            "lat": stmt.excluded.lat,
+            "lon": stmt.excluded.lon,
+            "payload": stmt.excluded.payload,
+            "format_version": stmt.excluded.format_version,
+            "current_data": null(),
+            "hourly_data": null(),
+            "daily_data": null(),
+            "timestamp": stmt.excluded.timestamp,
+        }
+    )
+    db.execute(stmt)
+
+def purge_weather_cache(db, max_age):
+    """Delete cached weather older than max_age; returns the number of rows removed"""
+    deleted = db.query(WeatherCache).filter(
+        WeatherCache.timestamp < datetime.utcnow() - max_age
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def _rollup_keys(city, timestamp):
+    """(period, bucket, city) keys a single search counts towards"""
+    city = normalize_city(city)
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return ("hour", hour, city), ("day", hour.replace(hour=0), city)
+
+def rollup_counts(rows):
+    """Aggregate search events ({city, timestamp} dicts) into rollup increments"""
+    counts = {}
+    for row in rows:
+        for key in _rollup_keys(row["city"], row["timestamp"]):
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def increment_search_rollups(db, counts):
+    """Add {(period, bucket, city): count} increments to the rollup table"""
+    if not counts:
+        return
+    # A stable row order keeps concurrent writers from deadlocking
+    values = [
+        {"period": period, "bucket": bucket, "city": city, "count": count}
+        for (period, bucket, city), count in sorted(counts.items())
+    ]
+    insert = _insert_for(db)
+    # Chunked to stay under SQLite's bound parameter limit
+    for start in range(0, len(values), 1000):
+        stmt = insert(SearchRollup).values(values[start:start + 1000])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SearchRollup.period, SearchRollup.bucket, SearchRollup.city],
+            set_={"count": SearchRollup.count + stmt.excluded.count}
+        )
+        db.execute(stmt)
+
+def purge_search_history(db, now=None):
+    """Apply the retention policy to raw history and hourly rollups; returns rows removed"""
+    now = now or datetime.utcnow()
+    raw = db.query(SearchHistory).filter(
+        SearchHistory.timestamp < now - timedelta(days=SEARCH_HISTORY_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    hourly = db.query(SearchRollup).filter(
+        SearchRollup.period == "hour",
+        SearchRollup.bucket < now - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return raw + hourly
+
+_OBSERVATION_SUMS = ("samples", "temp_sum", "humidity_sum", "pressure_sum",
+                     "wind_speed_sum", "forecast_samples", "forecast_temp_sum")
+
+def _observation_bucket(counts, city, timestamp):
+    """The hour and day accumulators an epoch timestamp falls into"""
+    hour = _EPOCH + timedelta(seconds=int(timestamp) // 3600 * 3600)
+    for resolution, bucket in (("hour", hour), ("day", hour.replace(hour=0))):
+        key = (city, resolution, bucket)
+        if key not in counts:
+            counts[key] = dict.fromkeys(_OBSERVATION_SUMS, 0)
+            counts[key].update(temp_min=None, temp_max=None)
+        yield counts[key]
+
+def observation_increments(events):
+    """Aggregate observation events into per-bucket increments
+
+    Each event has city, dt and the observed temp, humidity, pressure and
+    wind_speed, plus forecast_dt and forecast_temp for the nearest forecast
+    step, which is counted towards the bucket of the time it forecasts.
+    """
+    counts = {}
+    for observation in events:
+        for acc in _observation_bucket(counts, observation["city"], observation["dt"]):
+            acc["samples"] += 1
+            acc["temp_sum"] += observation["temp"]
+            acc["humidity_sum"] += observation["humidity"]
+            acc["pressure_sum"] += observation["pressure"]
+            acc["wind_speed_sum"] += observation["wind_speed"]
+            acc["temp_min"] = observation["temp"] if acc["temp_min"] is None else min(acc["temp_min"], observation["temp"])
+            acc["temp_max"] = observation["temp"] if acc["temp_max"] is None else max(acc["temp_max"], observation["temp"])
+        if observation.get("forecast_dt") is not None:
+            for acc in _observation_bucket(counts, observation["city"], observation["forecast_dt"]):
+                acc["forecast_samples"] += 1
+                acc["forecast_temp_sum"] += observation["forecast_temp"]
+    return counts
+
+def upsert_observations(db, counts):
+    """Add {(city, resolution, bucket): sums} increments to the observation store"""
+    if not counts:
+        return
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    values = [
+        {"city": city, "resolution": resolution, "bucket": bucket, **sums}
+        for (city, resolution, bucket), sums in sorted(counts.items())
+    ]
+    # SQLite's two-argument min/max are its LEAST/GREATEST, but they do not skip NULLs
+    least, greatest = (func.min, func.max) if sqlite else (func.least, func.greatest)
+    table = WeatherObservation.__table__
+    for start in range(0, len(values), 500):
+        stmt = _insert_for(db)(WeatherObservation).values(values[start:start + 500])
+        excluded = stmt.excluded
+        updates = {name: table.c[name] + excluded[name] for name in _OBSERVATION_SUMS}
+        updates["temp_min"] = least(func.coalesce(table.c.temp_min, excluded.temp_min),
+                                    func.coalesce(excluded.temp_min, table.c.temp_min))
+        updates["temp_max"] = greatest(func.coalesce(table.c.temp_max, excluded.temp_max),
+                                       func.coalesce(excluded.temp_max, table.c.temp_max))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WeatherObservation.city, WeatherObservation.resolution, WeatherObservation.bucket],
+            set_=updates
+        )
+        db.execute(stmt)
+
+OBSERVATION_COLUMNS = ("bucket", "temp_min", "temp_max") + _OBSERVATION_SUMS
+
+def observation_range(db, city, start, end, resolution):
+    """Rows of OBSERVATION_COLUMNS for buckets in [start, end), oldest first"""
+    columns = [getattr(WeatherObservation, name) for name in OBSERVATION_COLUMNS]
+    return db.query(*columns).filter(
+        WeatherObservation.city == city,
+        WeatherObservation.resolution == resolution,
+        WeatherObservation.bucket >= start,
+        WeatherObservation.bucket < end
+    ).order_by(WeatherObservation.bucket).all()
+
+def purge_observations(db, now=None):
+    """Drop hourly observations once only their daily buckets are kept; returns rows removed"""
+    now = now or datetime.utcnow()
+    removed = db.query(WeatherObservation).filter(
+        WeatherObservation.resolution == "hour",
+        WeatherObservation.bucket < now - timedelta(days=OBSERVATION_HOURLY_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+def count_searches(db, since):
+    """Number of searches per normalized city since a point in time, from the rollups"""
+    period = "day" if datetime.utcnow() - since > timedelta(days=2) else "hour"
+    return dict(top_searched_cities(db, since, limit=None, period=period))
+
+def top_searched_cities(db, since, limit=10, period="hour"):
+    """[(normalized city, searches)] since a point in time, most searched first"""
+    total = func.sum(SearchRollup.count)
+    query = db.query(SearchRollup.city, total).filter(
+        SearchRollup.period == period,
+        SearchRollup.bucket >= since
+    ).group_by(SearchRollup.city).order_by(total.desc(), SearchRollup.city)
+    if limit:
+        query = query.limit(limit)
+    return [(city, int(count)) for city, count in query.all()]
+
+def search_trend(db, since, cities, period="hour"):
+    """[(bucket, normalized city, searches)] for the given cities, oldest first"""
+    return db.query(SearchRollup.bucket, SearchRollup.city, SearchRollup.count).filter(
+        SearchRollup.period == period,
+        SearchRollup.bucket >= since,
+        SearchRollup.city.in_(cities)
+    ).order_by(SearchRollup.bucket).all()
+
+@contextmanager
+def session_scope():
+    """Check a short-lived session out of the pool for a single operation
+
+    Rolls back on error and always returns the connection to the pool.
+    Callers commit explicitly.
+    """
+    db = SessionLocal(bind=get_engine())
     try:
-        db = SessionLocal()
-        return db
-    except Exception as e:
-        if db:
-            db.close()
-        print(f"Database connection error: {str(e)}")
-        return None
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def get_pool_metrics():
+    """Snapshot of connection pool usage"""
+    pool = get_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+
+Gauge(
+    "raincheck_db_pool_connections", "Database connection pool usage",
+    lambda: {(state,): value for state, value in get_pool_metrics().items()}, ["state"]
+)
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["init"]:
+        converted = init_db()
+        print(f"Database schema is up to date ({converted} legacy cache rows converted)")
+    elif sys.argv[1:] == ["prune"]:
+        with session_scope() as db:
+            print(f"Removed {purge_search_history(db)} expired search history rows")
+            print(f"Compacted {purge_observations(db)} hourly weather observations")
+    else:
+        sys.exit("usage: python database.py init|prune")
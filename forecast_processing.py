@@ -0,0 +1,116 @@
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+# 1970-01-01, day zero of the epoch, was a Thursday
+_WEEKDAYS = np.array(['Thursday', 'Friday', 'Saturday', 'Sunday', 'Monday', 'Tuesday', 'Wednesday'], dtype=object)
+
+DAILY_COLUMNS = ['dt', 'day', 'temp_day', 'temp_night', 'condition', 'description']
+
+
+def forecast_frame(forecast_list):
+    """Normalize forecast entries into typed NumPy columns, reading each item once
+
+    Returns a dict of equal-length arrays: dt, temp, temp_min, temp_max,
+    condition and description.
+    """
+    n = len(forecast_list)
+    dt = np.empty(n, dtype=np.int64)
+    temp = np.empty(n, dtype=np.float64)
+    temp_min = np.empty(n, dtype=np.float64)
+    temp_max = np.empty(n, dtype=np.float64)
+    condition = np.empty(n, dtype=object)
+    description = np.empty(n, dtype=object)
+
+    for i, item in enumerate(forecast_list):
+        main = item['main']
+        weather = item['weather'][0]
+        dt[i] = item['dt']
+        temp[i] = main.get('temp', np.nan)
+        temp_min[i] = main.get('temp_min', np.nan)
+        temp_max[i] = main.get('temp_max', np.nan)
+        condition[i] = weather['main']
+        description[i] = weather['description']
+
+    return {
+        'dt': dt,
+        'temp': temp,
+        'temp_min': temp_min,
+        'temp_max': temp_max,
+        'condition': condition,
+        'description': description,
+    }
+
+def _local_seconds(dt, tz_offset):
+    """Epoch seconds shifted to the city's wall clock (tz_offset is seconds from UTC)"""
+    return dt + np.int64(tz_offset)
+
+def hourly_columns(frame, tz_offset=0, periods=8):
+    """Hourly temperatures for the first periods forecast steps, as lists per column"""
+    dt = frame['dt'][:periods]
+    seconds_of_day = _local_seconds(dt, tz_offset) % SECONDS_PER_DAY
+    return {
+        'dt': dt.tolist(),
+        'hour': [f"{s // 3600:02d}:{s % 3600 // 60:02d}" for s in seconds_of_day.tolist()],
+        'temp': frame['temp'][:periods].round(1).tolist(),
+        'condition': frame['condition'][:periods].tolist(),
+        'description': frame['description'][:periods].tolist(),
+    }
+
+def daily_columns(frame, tz_offset=0, days=7):
+    """Aggregate forecast steps into per-local-day highs, lows and conditions
+
+    Rows must be in time order; a day's condition is its most frequent one,
+    with ties going to the condition seen first that day. Returns lists per
+    column, at most days long.
+    """
+    dt = frame['dt']
+    n = len(dt)
+    if n == 0:
+        return {column: [] for column in DAILY_COLUMNS}
+
+    local_day = _local_seconds(dt, tz_offset) // SECONDS_PER_DAY
+
+    # Each run of rows sharing a local day is one output row
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    np.not_equal(local_day[1:], local_day[:-1], out=boundary[1:])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n)
+
+    # Rows past the last kept day are left out of the aggregation
+    starts, ends = starts[:days or None], ends[:days or None]
+    n = ends[-1]
+    groups = len(starts)
+
+    temp_day = np.maximum.reduceat(frame['temp_max'][:n], starts)
+    temp_night = np.minimum.reduceat(frame['temp_min'][:n], starts)
+
+    # Most frequent (condition, description) pair per day via a count matrix,
+    # ties going to the pair whose first row in that day comes earliest
+    condition = frame['condition']
+    description = frame['description']
+    labels = {}
+    codes = np.fromiter(
+        (labels.setdefault(pair, len(labels)) for pair in zip(condition[:n].tolist(), description[:n].tolist())),
+        dtype=np.int64, count=n,
+    )
+    group_of_row = np.repeat(np.arange(groups), ends - starts)
+    cell = group_of_row * len(labels) + codes
+    counts = np.bincount(cell, minlength=groups * len(labels))
+    first_row = np.full(groups * len(labels), n, dtype=np.int64)
+    # Assigning in reverse leaves each cell holding its earliest row
+    first_row[cell[::-1]] = np.arange(n - 1, -1, -1)
+    # Higher count wins, then lower first row; absent pairs score below any present one
+    score = counts * (n + 1) - first_row
+    best = score.reshape(groups, len(labels)).argmax(axis=1)
+    top = first_row[np.arange(groups) * len(labels) + best]
+
+    return {
+        'dt': dt[ends - 1].tolist(),
+        'day': _WEEKDAYS[local_day[starts] % 7].tolist(),
+        'temp_day': temp_day.round(1).tolist(),
+        'temp_night': temp_night.round(1).tolist(),
+        'condition': condition[top].tolist(),
+        'description': description[top].tolist(),
+    }
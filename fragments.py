@@ -0,0 +1,263 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import streamlit as st
+from cities import POPULAR_CITIES, normalize_city
+from memory_cache import LRUCache
+from metrics import span
+from styles import get_weather_icon
+
+logger = logging.getLogger(__name__)
+
+# Show how long each fragment took to render, for debugging; also enabled
+# per browser tab by adding ?timings=1 to the URL
+SHOW_TIMINGS = os.getenv("RAINCHECK_FRAGMENT_TIMINGS") == "1"
+
+# Rendered HTML and figures per (fragment, city, payload version), shared by
+# every session; a city's entries are replaced only when it is refetched
+_render_cache = LRUCache(maxsize=512)
+
+
+def payload_version(weather_data):
+    """Identifies one fetch of a city's weather; changes only when it is refetched"""
+    return weather_data["fetched_at"].isoformat()
+
+def timings_enabled():
+    return SHOW_TIMINGS or st.query_params.get("timings") == "1"
+
+@contextmanager
+def fragment_timer(name):
+    """Time a fragment into raincheck_span_seconds and optionally show it on the page"""
+    timing = {"cached": False}
+    start = time.perf_counter()
+    with span(f"render_{name}"):
+        yield timing
+    if timings_enabled():
+        elapsed = (time.perf_counter() - start) * 1000
+        st.caption(f"⏱ {name}: {elapsed:.1f} ms{' (cached)' if timing['cached'] else ''}")
+
+def _cached(timing, name, key, version, build):
+    """Build a fragment's output once per city and payload version"""
+    cache_key = (name, key, version)
+    value = _render_cache.get(cache_key)
+    if value is None:
+        value = build()
+        _render_cache.set(cache_key, value)
+    else:
+        timing["cached"] = True
+    return value
+
+def _current_cards(current):
+    """HTML for the condition, temperature, wind, humidity and pressure cards"""
+    # Convert wind speed from m/s to km/h (multiply by 3.6)
+    wind_speed_kmh = round(current['wind_speed'] * 3.6)
+    return {
+        "condition": f"""
+            <div class="weather-card">
+                <i class="{get_weather_icon(current['condition'])} weather-icon"></i>
+                <div>‎ </div>
+                <div>‎ </div>
+                <div class="condition-text">{current['description'].capitalize()}</div>
+            </div>
+        """,
+        "temp": f"""
+            <div class="weather-card">
+                <i class="fas fa-temperature-high weather-icon"></i>
+                <div class="temp-text">{round(current['temp'])}°C</div>
+                <div class="condition-text">Temperature</div>
+            </div>
+        """,
+        "wind": f"""
+            <div class="weather-card">
+                <i class="fas fa-wind weather-icon"></i>
+                <div class="temp-text">{wind_speed_kmh} km/h</div>
+                <div class="condition-text">Wind Speed</div>
+            </div>
+        """,
+        "humidity": f"""
+            <div class="weather-card">
+                <i class="fas fa-tint weather-icon"></i>
+                <div class="temp-text">{current['humidity']}%</div>
+                <div class="condition-text">Humidity</div>
+            </div>
+        """,
+        "pressure": f"""
+            <div class="weather-card">
+                <i class="fas fa-compress-arrows-alt weather-icon"></i>
+                <div class="temp-text">{current['pressure']} hPa</div>
+                <div class="condition-text">Pressure</div>
+            </div>
+        """,
+    }
+
+@st.fragment
+def current_conditions(key, version, weather_data):
+    """Current weather cards"""
+    with fragment_timer("current") as timing:
+        cards = _cached(timing, "current", key, version, lambda: _current_cards(weather_data['current']))
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(cards["condition"], unsafe_allow_html=True)
+        with col2:
+            st.markdown(cards["temp"], unsafe_allow_html=True)
+        with col3:
+            st.markdown(cards["wind"], unsafe_allow_html=True)
+        with col4:
+            # The clock is the one card that changes on every run
+            dt_string = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+            st.markdown(f"""
+                <div class="weather-card">
+                    <div> </div>
+                    <div class="temp-text">{dt_string}</div>
+                    <div class="condition-text">Date & Time</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+            st.markdown("""
+                <script>
+                function updateTime() {
+                    var now = new Date();
+                    var dt_string = now.toLocaleTimeString();
+                    document.querySelector('.weather-card div').innerText = dt_string;
+                }
+                setInterval(updateTime, 1000);
+                </script>
+            """, unsafe_allow_html=True)
+
+        # Additional weather info
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(cards["humidity"], unsafe_allow_html=True)
+        with col2:
+            st.markdown(cards["pressure"], unsafe_allow_html=True)
+
+@st.fragment
+def hourly_forecast(key, version, weather_data, weather_service):
+    """Hourly temperature chart"""
+    with fragment_timer("hourly") as timing:
+        st.subheader("Hourly Forecast")
+
+        def build():
+            # Plotly is only imported once a chart is actually drawn
+            from visualization import create_hourly_temp_chart
+            return create_hourly_temp_chart(weather_service.process_hourly_forecast(weather_data))
+
+        st.plotly_chart(_cached(timing, "hourly", key, version, build), use_container_width=True)
+
+def _daily_cards(daily_data):
+    return "".join(f"""
+        <div class="weather-card">
+            <div style="font-weight: bold">{row['day']}</div>
+            <i class="{get_weather_icon(row['condition'])} weather-icon"></i>
+            <div style="font-size: 1.2rem">
+                <span style="color: #FF4B4B">High: {row['temp_day']}°C</span> |
+                <span style="color: #4B9FFF">Low: {row['temp_night']}°C</span>
+            </div>
+            <div>{row['description'].capitalize()}</div>
+        </div>
+    """ for _, row in daily_data.iterrows())
+
+@st.fragment
+def daily_forecast(key, version, weather_data, weather_service):
+    """Detailed daily forecast cards"""
+    with fragment_timer("daily") as timing:
+        st.subheader("Detailed Daily Forecast")
+        cards = _cached(timing, "daily", key, version,
+                        lambda: _daily_cards(weather_service.process_daily_forecast(weather_data['daily'])))
+        st.markdown(cards, unsafe_allow_html=True)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_observations(key, days, _weather_service):
+    """Observation arrays for a normalized city, re-read at most every five minutes"""
+    return _weather_service.get_observations(key, days=days)
+
+@st.fragment
+def observed_vs_forecast(city, weather_service):
+    """Stored observations against what was forecast for the same times"""
+    with st.expander("Observed vs. forecast"):
+        history_days = st.radio(
+            "Range", options=[7, 30, 365], format_func=lambda days: f"{days} days",
+            horizontal=True, key="history_days"
+        )
+        with fragment_timer("observed"):
+            observations = load_observations(normalize_city(city), history_days, weather_service)
+            if len(observations['time']):
+                from visualization import create_observed_vs_forecast_chart
+                st.plotly_chart(create_observed_vs_forecast_chart(observations), use_container_width=True)
+            else:
+                st.info("No observations recorded for this city yet.")
+
+@st.fragment
+def compare_cities(weather_service):
+    """Side-by-side comparison, fetched with one bulk lookup"""
+    with st.expander("Compare cities"):
+        cities = st.multiselect(
+            "Cities to compare",
+            options=POPULAR_CITIES,
+            # Nothing is fetched until the user picks cities; a collapsed
+            # expander still runs its body on every rerun
+            default=[],
+            placeholder="Choose cities",
+            key="compare_cities"
+        )
+        if not cities:
+            return
+        with fragment_timer("compare"):
+            with st.spinner("Fetching weather data..."):
+                results, errors = weather_service.get_weather_bulk(cities)
+            rows = []
+            for name in cities:
+                if name not in results:
+                    continue
+                data = results[name]
+                today = data['daily']
+                rows.append({
+                    "City": name,
+                    "Condition": data['current']['description'].capitalize(),
+                    "Temp °C": round(data['current']['temp']),
+                    "High °C": today['temp_day'][0] if today['temp_day'] else None,
+                    "Low °C": today['temp_night'][0] if today['temp_night'] else None,
+                    "Humidity %": data['current']['humidity'],
+                    "Wind km/h": round(data['current']['wind_speed'] * 3.6),
+                    "Updated": f"{data['age_seconds'] // 60} min ago",
+                })
+            if rows:
+                st.dataframe(rows, hide_index=True, use_container_width=True)
+            for name, error in errors.items():
+                st.warning(f"⚠️ {name}: {error}")
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_search_trends(days=7, top=10):
+    """Most searched cities and their hourly counts, read from the search rollups"""
+    from database import database_configured, session_scope, search_trend, top_searched_cities
+
+    if not database_configured():
+        return [], []
+    now = datetime.utcnow()
+    with session_scope() as db:
+        top_cities = top_searched_cities(db, now - timedelta(days=days), top, period="day")
+        hourly = search_trend(db, now - timedelta(hours=24), [city for city, _ in top_cities[:5]])
+    return top_cities, hourly
+
+@st.fragment
+def search_trends():
+    """What other visitors are looking up"""
+    with st.expander("Search trends"), fragment_timer("trends"):
+        try:
+            top_cities, hourly = load_search_trends()
+            if top_cities:
+                import pandas as pd
+
+                st.markdown("**Most searched cities, last 7 days**")
+                st.bar_chart(pd.DataFrame(top_cities, columns=["City", "Searches"]).set_index("City"))
+                if hourly:
+                    st.markdown("**Searches per hour, last 24 hours**")
+                    trend = pd.DataFrame(hourly, columns=["Hour", "City", "Searches"])
+                    st.line_chart(trend.pivot(index="Hour", columns="City", values="Searches").fillna(0))
+            else:
+                st.info("No searches recorded yet.")
+        except Exception:
+            logger.exception("Failed to load search trends")
+            st.info("Search trends are unavailable right now.")
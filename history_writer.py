@@ -0,0 +1,165 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from metrics import Gauge, span
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryWriter:
+    """Buffer search history events in memory and write them in batches
+
+    Events are flushed by a background thread once batch_size events are
+    queued or flush_interval seconds have passed, whichever comes first.
+    When the queue is full new events are dropped rather than blocking the
+    page render; the dropped counter records how many were lost.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    thread_name = "search-history-writer"
+
+    def record(self, city):
+        """Queue a search event without touching the database"""
+        return self._enqueue({"city": city, "timestamp": datetime.utcnow()})
+
+    def _enqueue(self, event):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        """Collect events until the batch is full or the flush interval elapses"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, rows):
+        """Bulk insert a batch of events and add them to the hourly and daily rollups"""
+        # Imported here so that importing the writer doesn't load SQLAlchemy
+        from sqlalchemy import insert
+        from database import database_configured, session_scope, increment_search_rollups, rollup_counts, SearchHistory
+
+        if not database_configured():
+            self.dropped += len(rows)
+            return
+        try:
+            with span("history_write"), session_scope() as db:
+                db.execute(insert(SearchHistory), rows)
+                increment_search_rollups(db, rollup_counts(rows))
+                db.commit()
+            self.written += len(rows)
+        except Exception:
+            self.dropped += len(rows)
+            logger.exception("Failed to write %d search history events", len(rows))
+
+    def flush(self):
+        """Synchronously write everything still queued"""
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(rows), self.batch_size):
+            self._write(rows[start:start + self.batch_size])
+
+    def close(self):
+        """Stop the background thread and write any remaining events"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+class ObservationWriter(SearchHistoryWriter):
+    """Batch fetched weather observations into the hourly and daily observation store"""
+
+    thread_name = "observation-writer"
+
+    def record(self, event):
+        """Queue an observation event (see database.observation_increments)"""
+        return self._enqueue(event)
+
+    def _write(self, rows):
+        from database import database_configured, session_scope, observation_increments, upsert_observations
+
+        if not database_configured():
+            self.dropped += len(rows)
+            return
+        try:
+            with span("observation_write"), session_scope() as db:
+                upsert_observations(db, observation_increments(rows))
+                db.commit()
+            self.written += len(rows)
+        except Exception:
+            self.dropped += len(rows)
+            logger.exception("Failed to write %d weather observations", len(rows))
+
+_writer = SearchHistoryWriter()
+atexit.register(_writer.close)
+_observation_writer = ObservationWriter()
+atexit.register(_observation_writer.close)
+
+def record_search(city):
+    """Queue a search history event for the shared background writer"""
+    return _writer.record(city)
+
+def record_observation(event):
+    """Queue a weather observation for the shared background writer"""
+    return _observation_writer.record(event)
+
+def close_history_writer():
+    """Write out everything queued, e.g. before the database goes away"""
+    _writer.close()
+    _observation_writer.close()
+
+def get_history_writer_stats():
+    return _writer.stats()
+
+Gauge(
+    "raincheck_search_history_events", "Search history events by state (queued, written, dropped)",
+    lambda: {(state,): value for state, value in _writer.stats().items()}, ["state"]
+)
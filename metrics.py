@@ -0,0 +1,204 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Metrics are off unless RAINCHECK_METRICS=1; disabled metrics and spans
+# return immediately so the hot path pays only a flag check
+ENABLED = os.getenv("RAINCHECK_METRICS") == "1"
+METRICS_PORT = int(os.getenv("RAINCHECK_METRICS_PORT", "9108"))
+
+# Upper bounds in seconds, from cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_NOOP_SPAN = nullcontext()
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class Gauge:
+    """Value read at scrape time from a callback returning a number or a {labelvalues: number} dict"""
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _registry.append(self)
+
+    def collect(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.debug("Gauge %s failed: %s", self.name, e)
+            return
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+SPAN_SECONDS = Histogram(
+    "raincheck_span_seconds", "Duration of WeatherService steps", ["span"]
+)
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        SPAN_SECONDS.observe(elapsed, self.name)
+        logger.debug("span %s took %.2f ms%s", self.name, elapsed * 1000, " (failed)" if exc_type else "")
+        return False
+
+def span(name):
+    """Time a block into raincheck_span_seconds{span=name}"""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name)
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_failed = False
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, attempts=1):
+    """Serve /metrics from a daemon thread, once per process; a no-op when metrics are disabled
+
+    With attempts > 1 the first free port of attempts consecutive ones is
+    used, so several worker processes can each serve their own metrics.
+    """
+    global _server, _server_failed
+    if not ENABLED:
+        return None
+    with _server_lock:
+        # A failed bind is not retried, so Streamlit reruns don't log it again
+        if _server is None and not _server_failed:
+            first_port = METRICS_PORT if port is None else port
+            for candidate in range(first_port, first_port + max(1, attempts)):
+                try:
+                    _server = ThreadingHTTPServer(("0.0.0.0", candidate), _MetricsHandler)
+                    break
+                except OSError as e:
+                    error = e
+            else:
+                _server_failed = True
+                logger.warning("Failed to start metrics endpoint: %s", error)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import Counter, Histogram, span
+from rate_limiter import BACKGROUND, INTERACTIVE, PostgresTokenBucket, PriorityRateLimiter, RateLimited, TokenBucket, current_priority
+
+API_ROOT = os.getenv("OPENWEATHER_API_ROOT", "https://api.openweathermap.org")
+
+# Per-endpoint (connect, read) timeouts in seconds
+ENDPOINT_TIMEOUTS = {
+    "geocode": (3.05, 5),
+    "weather": (3.05, 10),
+    "forecast": (3.05, 15),
+}
+
+# Per-endpoint retry budgets for transient upstream failures
+ENDPOINT_RETRIES = {
+    "geocode": 2,
+    "weather": 2,
+    "forecast": 3,
+}
+
+ENDPOINT_PATHS = {
+    "geocode": "/geo/1.0/direct",
+    "weather": "/data/2.5/weather",
+    "forecast": "/data/2.5/forecast",
+}
+
+# Upstream call budget shared by every client in the process (0 disables it).
+# OpenWeather's free tier allows 60 calls/minute.
+CALLS_PER_MINUTE = float(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+BURST = float(os.getenv("OPENWEATHER_BURST", "10"))
+# Share the budget across processes through a Postgres row
+SHARED_LIMIT = os.getenv("OPENWEATHER_RATE_LIMIT_SHARED") == "1"
+
+# How long a call may wait for its turn before giving up, by priority
+LIMIT_TIMEOUTS = {INTERACTIVE: float(os.getenv("OPENWEATHER_LIMIT_TIMEOUT", "10")), BACKGROUND: 120.0}
+
+# Pause used when a 429 response carries no usable Retry-After
+DEFAULT_RETRY_AFTER = 60.0
+
+UPSTREAM_SECONDS = Histogram(
+    "raincheck_upstream_request_seconds", "OpenWeather request latency, including retries", ["endpoint"]
+)
+UPSTREAM_REQUESTS = Counter(
+    "raincheck_upstream_requests_total", "OpenWeather requests by final status", ["endpoint", "status"]
+)
+
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "raincheck_rate_limit_wait_seconds", "Time spent waiting for the upstream rate limiter", ["priority"]
+)
+RATE_LIMITED = Counter(
+    "raincheck_rate_limited_total", "Upstream calls refused by the local limiter or answered with 429", ["reason"]
+)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """The process-wide upstream limiter, or None when limiting is disabled"""
+    global _limiter
+    if _limiter is None and CALLS_PER_MINUTE > 0:
+        with _limiter_lock:
+            if _limiter is None:
+                rate = CALLS_PER_MINUTE / 60.0
+                bucket = PostgresTokenBucket("openweather", rate, BURST) if SHARED_LIMIT else TokenBucket(rate, BURST)
+                _limiter = PriorityRateLimiter(bucket)
+    return _limiter
+
+def _retry_after_seconds(value):
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+# Current weather and forecast are fetched side by side, so a handful of
+# workers covers many concurrent page loads
+_fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="openweather")
+_sessions = {}
+
+def _build_session(api_root):
+    """Create a keep-alive session with per-endpoint retry and backoff"""
+    session = requests.Session()
+    for endpoint, path in ENDPOINT_PATHS.items():
+        retry = Retry(
+            total=ENDPOINT_RETRIES[endpoint],
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            # 429s are handled by the client, which pauses all callers instead
+            # of sleeping inside one request
+            respect_retry_after_header=False,
+        )
+        # requests picks the adapter with the longest matching prefix
+        session.mount(api_root + path, HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=32))
+    return session
+
+def get_session(api_root=API_ROOT):
+    """Get the process-wide pooled session for an API root"""
+    session = _sessions.get(api_root)
+    if session is None:
+        session = _sessions.setdefault(api_root, _build_session(api_root))
+    return session
+
+class OpenWeatherClient:
+    """Thin client for the OpenWeather endpoints used by the app"""
+
+    def __init__(self, api_key, api_root=API_ROOT):
+        self.api_key = api_key
+        self.api_root = api_root
+        self.session = get_session(api_root)
+
+    def _acquire(self, calls=1):
+        """Wait for the shared rate limiter at the caller's priority
+
+        Raises RateLimited when the wait times out.
+        """
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return
+        priority = current_priority()
+        start = time.perf_counter()
+        deadline = start + LIMIT_TIMEOUTS.get(priority)
+        acquired = all(
+            limiter.acquire(priority=priority, timeout=max(0.0, deadline - time.perf_counter()))
+            for _ in range(calls)
+        )
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, "background" if priority == BACKGROUND else "interactive")
+        if not acquired:
+            RATE_LIMITED.inc("throttled")
+            raise RateLimited("OpenWeather call budget exhausted", limiter.retry_after())
+
+    def _get_json(self, endpoint, params, acquire=True):
+        """Call an endpoint and return its decoded JSON body
+
+        Waits for the shared rate limiter first unless the caller already
+        has. Raises RateLimited when the wait times out or OpenWeather
+        answers 429, after pausing all callers for the Retry-After period.
+        """
+        if acquire:
+            self._acquire()
+        limiter = get_rate_limiter()
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(
+                self.api_root + ENDPOINT_PATHS[endpoint],
+                params={**params, "appid": self.api_key},
+                timeout=ENDPOINT_TIMEOUTS[endpoint],
+            )
+        except requests.exceptions.RequestException:
+            UPSTREAM_REQUESTS.inc(endpoint, "error")
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint)
+        UPSTREAM_REQUESTS.inc(endpoint, str(response.status_code))
+        if response.status_code == 401:
+            raise ValueError("Invalid API key. Please check your OpenWeather API key.")
+        if response.status_code == 429:
+            retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+            RATE_LIMITED.inc("429")
+            if limiter is not None:
+                limiter.pause(retry_after)
+            raise RateLimited("OpenWeather rate limit reached", retry_after)
+        response.raise_for_status()
+        return response.json()
+
+    def geocode(self, city):
+        """Look up matching locations for a city name"""
+        with span("geocode"):
+            return self._get_json("geocode", {"q": city, "limit": 1})
+
+    def current(self, lat, lon, acquire=True):
+        """Get current weather for coordinates"""
+        with span("current"):
+            return self._get_json("weather", {"lat": lat, "lon": lon, "units": "metric"}, acquire)
+
+    def forecast(self, lat, lon, acquire=True):
+        """Get the 5-day / 3-hour forecast for coordinates"""
+        with span("forecast"):
+            return self._get_json("forecast", {"lat": lat, "lon": lon, "units": "metric"}, acquire)
+
+    def current_and_forecast(self, lat, lon):
+        """Fetch current weather and forecast concurrently"""
+        # Both calls are paid for here, in the caller's thread and at its
+        # priority, so the shared executor only ever runs requests that are
+        # ready to go and never fills up with threads waiting on the limiter
+        self._acquire(calls=2)
+        current_future = _fetch_executor.submit(self.current, lat, lon, False)
+        forecast_future = _fetch_executor.submit(self.forecast, lat, lon, False)
+        return current_future.result(), forecast_future.result()
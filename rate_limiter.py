@@ -0,0 +1,169 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """Raised when an upstream call cannot be made within the rate limit"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@contextmanager
+def priority_scope(priority):
+    """Run upstream calls made in this block (and its context) at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority():
+    return _priority.get()
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing upstream API calls"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate  # tokens added per second
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """Take tokens if available; returns 0 on success, else seconds until they would be"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; returns False if the timeout expires"""
+        if tokens > self.capacity:
+            raise ValueError("Cannot acquire more tokens than the bucket capacity")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+class PostgresTokenBucket:
+    """Token bucket kept in a rate_limit_buckets row, shared by every process on the database
+
+    Refill uses the database clock, so hosts with skewed clocks agree. If
+    the database is unreachable, the process falls back to a local bucket
+    with the same rate.
+    """
+
+    def __init__(self, name, rate, capacity=None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._fallback = TokenBucket(rate, self.capacity)
+        self._created = False
+
+    def reserve(self, tokens=1):
+        from sqlalchemy import text
+        from database import session_scope
+
+        params = {"name": self.name, "rate": self.rate, "capacity": self.capacity, "tokens": tokens}
+        available = "LEAST(:capacity, tokens + (extract(epoch FROM clock_timestamp()) - updated_at) * :rate)"
+        try:
+            with session_scope() as db:
+                if not self._created:
+                    db.execute(text(
+                        "INSERT INTO rate_limit_buckets (name, tokens, updated_at) "
+                        "VALUES (:name, :capacity, extract(epoch FROM clock_timestamp())) ON CONFLICT (name) DO NOTHING"
+                    ), params)
+                taken = db.execute(text(
+                    f"UPDATE rate_limit_buckets SET tokens = {available} - :tokens, "
+                    "updated_at = extract(epoch FROM clock_timestamp()) "
+                    f"WHERE name = :name AND {available} >= :tokens RETURNING tokens"
+                ), params).first()
+                if taken is None:
+                    left = db.execute(text(f"SELECT {available} FROM rate_limit_buckets WHERE name = :name"), params).scalar()
+                db.commit()
+                self._created = True
+        except Exception:
+            # Without the database, limit this process on its own
+            return self._fallback.reserve(tokens)
+        return 0.0 if taken is not None else (tokens - left) / self.rate
+
+class PriorityRateLimiter:
+    """Hand out a bucket's tokens in priority order, then first come first served
+
+    Only the first waiter in line draws from the bucket, so background
+    refreshes never take tokens while an interactive request is waiting.
+    pause() holds everyone back, e.g. to honour an upstream Retry-After.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._waiters = []  # heap of (priority, arrival)
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def retry_after(self, tokens=1):
+        """Rough number of seconds before a new caller could be served"""
+        return max(self._paused_until - time.monotonic(), tokens / self.bucket.rate)
+
+    def acquire(self, tokens=1, priority=None, timeout=None):
+        """Block until it is this caller's turn and tokens are available; False on timeout"""
+        entry = (current_priority() if priority is None else priority, next(self._arrivals))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if deadline is not None and self._paused_until > deadline:
+                # Paused for longer than the caller is willing to wait
+                return False
+            heapq.heappush(self._waiters, entry)
+            # A new head of the line re-evaluates immediately
+            self._cond.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] == entry:
+                        wait = self._paused_until - now
+                        if wait <= 0:
+                            wait = self.bucket.reserve(tokens)
+                            if wait <= 0:
+                                return True
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
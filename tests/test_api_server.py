@@ -0,0 +1,140 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from stub_server import start_stub_server
+
+# Configure the service before it is imported: no database, no upstream rate
+# limit (a 429 would otherwise pause the process-wide limiter) and the stub
+# in place of OpenWeather
+STUB, STUB_ROOT = start_stub_server()
+os.environ.update({
+    "OPENWEATHER_API_KEY": "test",
+    "OPENWEATHER_API_ROOT": STUB_ROOT,
+    "OPENWEATHER_CALLS_PER_MINUTE": "0",
+    "WEATHER_CACHE_BACKEND": "memory",
+    "DATABASE_URL": "",
+})
+
+import api_server
+import weather_service
+from cache_backend import MemoryCacheBackend
+from openweather_client import OpenWeatherClient
+from weather_service import WeatherService
+
+
+def request(method, path, headers=(), body=b""):
+    """Drive the ASGI app for one request; returns (status, headers, body)"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(api_server.app(scope, receive, send))
+    start, sent = messages
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, sent["body"]
+
+@pytest.fixture
+def service():
+    """A fresh service on the memory backend, with every in-process cache emptied"""
+    for cache in (weather_service._weather_l1, weather_service._geocode_lru, api_server._responses):
+        cache.clear()
+    STUB.calls.clear()
+    api_server._service = WeatherService(cache=MemoryCacheBackend())
+    api_server._service.client = OpenWeatherClient("test", api_root=STUB_ROOT)
+    yield api_server._service
+    api_server._service = None
+
+def test_etag_revalidation(service):
+    status, headers, body = request("GET", "/weather?city=Cape+Town")
+    assert status == 200
+    assert headers["etag"].startswith('W/"')
+    assert int(headers["cache-control"].removeprefix("max-age=")) > 0
+    assert json.loads(body)["city"] == "cape town"
+
+    # Another spelling of the same city matches, weakly or strongly
+    for etag in (headers["etag"], headers["etag"].removeprefix("W/")):
+        status, not_modified, body = request("GET", "/weather?city=cape%20town", [("If-None-Match", etag)])
+        assert (status, body) == (304, b"")
+        assert not_modified["etag"] == headers["etag"]
+
+    status, _, _ = request("GET", "/weather?city=Cape+Town", [("If-None-Match", 'W/"other"')])
+    assert status == 200
+
+def test_gzip_and_vary(service):
+    _, plain_headers, plain = request("GET", "/weather?city=Durban")
+    status, headers, body = request("GET", "/weather?city=Durban", [("Accept-Encoding", "gzip, br")])
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == plain
+    assert headers["vary"] == plain_headers["vary"] == "accept-encoding"
+    assert "content-encoding" not in plain_headers
+
+    # Small bodies go out as they are
+    _, headers, _ = request("GET", "/healthz", [("Accept-Encoding", "gzip")])
+    assert "content-encoding" not in headers
+
+def test_unknown_path_and_method(service):
+    assert request("GET", "/nope")[0] == 404
+    assert request("POST", "/weather")[0] == 405
+    assert request("GET", "/weather")[0] == 400
+
+def test_unknown_city_is_404(service, monkeypatch):
+    monkeypatch.setattr(service.client, "geocode", lambda city: [])
+    status, _, body = request("GET", "/weather?city=Nowhere+Land")
+    assert status == 404
+    assert "not found" in json.loads(body)["error"]
+
+def test_rate_limited_is_503_with_retry_after(service):
+    server, root = start_stub_server(quota=1)
+    try:
+        service.client = OpenWeatherClient("test", api_root=root)
+        status, headers, body = request("GET", "/weather?city=Quota+Town")
+    finally:
+        server.shutdown()
+    assert status == 503
+    assert int(headers["retry-after"]) >= 1
+    assert "error" in json.loads(body)
+
+def test_bulk_dedupes_spellings(service):
+    status, headers, body = request("GET", "/weather/bulk?city=Paris,paris&city=PARIS%20,Durban")
+    assert status == 200
+    data = json.loads(body)
+    assert list(data["results"]) == ["Paris", "paris", "PARIS", "Durban"]
+    assert data["errors"] == {}
+    assert data["results"]["Paris"] == data["results"]["PARIS"]
+    # One upstream fetch per distinct city
+    assert STUB.calls["/data/2.5/forecast"] == 2
+
+    # A complete answer revalidates like a single city
+    status, _, _ = request("GET", "/weather/bulk?city=Paris,paris&city=PARIS%20,Durban", [("If-None-Match", headers["etag"])])
+    assert status == 304
+
+def test_bulk_post(service):
+    status, _, body = request("POST", "/weather/bulk", body=json.dumps({"cities": ["Lyon", "lyon"]}).encode())
+    assert status == 200
+    assert list(json.loads(body)["results"]) == ["Lyon", "lyon"]
+    assert STUB.calls["/data/2.5/forecast"] == 1
+
+    assert request("POST", "/weather/bulk", body=b"[1]")[0] == 400
+    assert request("POST", "/weather/bulk", body=b'{"cities": [1]}')[0] == 400
+    assert request("GET", "/weather/bulk")[0] == 400
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache_codec import FORMAT_VERSION, decode_payload, encode_payload
+
+PAYLOAD = {
+    "current": {"dt": 1700000000, "timezone": 3600, "condition": "Clouds", "description": "few clouds",
+                "temp": 12.3, "humidity": 81, "pressure": 1012, "wind_speed": 4.6},
+    "hourly": {"dt": [1700000000 + 10800 * i for i in range(8)], "hour": ["01:00"] * 8,
+               "temp": [12.3] * 8, "condition": ["Clouds"] * 8, "description": ["few clouds"] * 8},
+    "daily": {"dt": [1700064000], "day": ["Tuesday"], "temp_day": [14.1], "temp_night": [8.2],
+              "condition": ["Rain"], "description": ["light rain"]},
+}
+
+
+@pytest.mark.parametrize("compress", [None, False, True])
+def test_round_trip(compress):
+    assert decode_payload(encode_payload(PAYLOAD, compress=compress)) == PAYLOAD
+
+def test_compression_shrinks_large_payloads():
+    payload = dict(PAYLOAD, hourly={k: v * 50 for k, v in PAYLOAD["hourly"].items()})
+    compressed = encode_payload(payload)
+    assert len(compressed) < len(encode_payload(payload, compress=False))
+    assert decode_payload(memoryview(compressed)) == payload
+
+def test_rejects_other_format_versions():
+    blob = bytearray(encode_payload(PAYLOAD))
+    blob[2] = FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        decode_payload(blob)
+
+def test_rejects_foreign_bytes():
+    with pytest.raises(ValueError):
+        decode_payload(b'{"current": {}}')
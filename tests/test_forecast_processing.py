@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from forecast_processing import SECONDS_PER_DAY, daily_columns, forecast_frame, hourly_columns
+
+CONDITIONS = [('Clear', 'clear sky'), ('Clouds', 'few clouds'), ('Clouds', 'overcast clouds'), ('Rain', 'light rain')]
+
+
+def random_forecast(rng, steps=40, start=1_700_000_000):
+    """Three-hourly forecast columns with few distinct conditions, so ties are common"""
+    picks = rng.integers(0, len(CONDITIONS), steps)
+    temp = rng.normal(15, 5, steps)
+    return {
+        'dt': start + 10800 * np.arange(steps, dtype=np.int64),
+        'temp': temp,
+        'temp_min': temp - rng.random(steps),
+        'temp_max': temp + rng.random(steps),
+        'condition': np.array([CONDITIONS[i][0] for i in picks], dtype=object),
+        'description': np.array([CONDITIONS[i][1] for i in picks], dtype=object),
+    }
+
+def reference_daily(frame, tz_offset=0, days=7):
+    """The same aggregation with a plain pandas groupby"""
+    df = pd.DataFrame(frame)
+    df['local_day'] = (df['dt'] + tz_offset) // SECONDS_PER_DAY
+    rows = []
+    for _, day in df.groupby('local_day', sort=False):
+        pairs = list(zip(day['condition'], day['description']))
+        # value_counts keeps first-appearance order, and idxmax takes the first maximum
+        condition, description = pd.Series(pairs).value_counts(sort=False).idxmax()
+        rows.append({
+            'dt': day['dt'].iloc[-1],
+            'temp_day': round(day['temp_max'].max(), 1),
+            'temp_night': round(day['temp_min'].min(), 1),
+            'condition': condition,
+            'description': description,
+        })
+    return pd.DataFrame(rows).head(days)
+
+def test_daily_columns_match_groupby():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        frame = random_forecast(rng, steps=int(rng.integers(1, 41)))
+        tz_offset = int(rng.integers(-12, 15)) * 3600
+        days = int(rng.integers(1, 8))
+        expected = reference_daily(frame, tz_offset, days)
+        actual = pd.DataFrame(daily_columns(frame, tz_offset, days))[list(expected.columns)]
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+def test_hourly_columns_use_local_time():
+    rng = np.random.default_rng(2)
+    frame = random_forecast(rng, start=1_700_000_000 - 1_700_000_000 % SECONDS_PER_DAY)
+    hourly = hourly_columns(frame, tz_offset=2 * 3600 + 1800, periods=3)
+    assert hourly['hour'] == ['02:30', '05:30', '08:30']
+    assert hourly['temp'] == [round(t, 1) for t in frame['temp'][:3]]
+
+def test_forecast_frame_reads_api_items():
+    items = [{'dt': 10800 * i, 'main': {'temp': 20.0 + i, 'temp_min': 19.0, 'temp_max': 21.0 + i},
+              'weather': [{'main': 'Clear', 'description': 'clear sky'}]} for i in range(3)]
+    daily = daily_columns(forecast_frame(items))
+    assert daily == {'dt': [21600], 'day': ['Thursday'], 'temp_day': [23.0], 'temp_night': [19.0],
+                     'condition': ['Clear'], 'description': ['clear sky']}
+
+def test_daily_condition_tie_goes_to_first_in_day():
+    # 'Rain' appears before 'Clear' overall, but 'Clear' comes first on the second day
+    frame = {
+        'dt': np.array([0, 3600, 86400, 90000, 93600, 97200], dtype=np.int64),
+        'temp': np.zeros(6),
+        'temp_min': np.zeros(6),
+        'temp_max': np.zeros(6),
+        'condition': np.array(['Rain', 'Rain', 'Clear', 'Rain', 'Clear', 'Rain'], dtype=object),
+        'description': np.array(['light rain', 'light rain', 'clear sky', 'light rain', 'clear sky', 'light rain'], dtype=object),
+    }
+    assert daily_columns(frame)['condition'] == ['Rain', 'Clear']
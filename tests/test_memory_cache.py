@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from memory_cache import LRUCache, TTLCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+def test_ttl_entries_expire():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (2, 1, 1)
+    assert stats["size"] == 1
+
+def test_ttl_cache_evicts_when_full():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_cache_skips_non_positive_ttl():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert "a" not in cache
+    assert cache.pop("a", "missing") == "missing"
@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rate_limiter import BACKGROUND, INTERACTIVE, PriorityRateLimiter, TokenBucket, priority_scope
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the limiter queue"
+        time.sleep(0.001)
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.03
+
+def test_token_bucket_acquire_times_out():
+    bucket = TokenBucket(rate=0.5, capacity=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.05)
+
+def test_interactive_callers_go_first():
+    limiter = PriorityRateLimiter(TokenBucket(rate=20, capacity=1))
+    # Hold the line so both callers are queued before either is served
+    limiter.pause(0.3)
+    served = []
+
+    def caller(name, priority):
+        with priority_scope(priority):
+            assert limiter.acquire(timeout=5)
+        served.append(name)
+
+    background = threading.Thread(target=caller, args=("background", BACKGROUND))
+    background.start()
+    wait_for(lambda: len(limiter._waiters) == 1)
+    interactive = threading.Thread(target=caller, args=("interactive", INTERACTIVE))
+    interactive.start()
+    wait_for(lambda: len(limiter._waiters) == 2)
+    background.join()
+    interactive.join()
+
+    assert served == ["interactive", "background"]
+
+def test_pause_is_honoured():
+    limiter = PriorityRateLimiter(TokenBucket(rate=100))
+    limiter.pause(0.1)
+    assert limiter.retry_after() > 0.05
+    # Callers unwilling to wait out the pause give up straight away
+    started = time.monotonic()
+    assert not limiter.acquire(timeout=0.01)
+    assert time.monotonic() - started < 0.05
+    assert limiter.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for callers to join"
+        time.sleep(0.001)
+
+def run_concurrently(flight, fn):
+    """Start CALLERS calls for one key and return their futures once all have joined"""
+    pool = ThreadPoolExecutor(CALLERS)
+    futures = [pool.submit(flight.do, "london", fn) for _ in range(CALLERS)]
+    wait_for(lambda: flight.shared == CALLERS - 1)
+    return pool, futures
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return {"city": "London"}
+
+    pool, futures = run_concurrently(flight, fetch)
+    release.set()
+    results = [f.result() for f in futures]
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert flight.executions == 1
+    assert all(r is results[0] for r in results)
+    assert flight.in_flight() == 0
+
+def test_waiters_see_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    error = ValueError("City not found")
+
+    def fetch():
+        release.wait()
+        raise error
+
+    pool, futures = run_concurrently(flight, fetch)
+    release.set()
+    for f in futures:
+        with pytest.raises(ValueError) as excinfo:
+            f.result()
+        assert excinfo.value is error
+    pool.shutdown()
+
+    assert flight.executions == 1
+    assert flight.in_flight() == 0
+
+def test_finished_key_runs_again():
+    flight = SingleFlight()
+    assert flight.do("paris", lambda: 1) == 1
+    assert flight.do("paris", lambda: 2) == 2
+    assert flight.executions == 2
+    assert flight.shared == 0
@@ -1,8 +1,50 @@
+import hashlib
+import json
+import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
+import plotly.io as pio
+from memory_cache import LRUCache
+
+# Layout shared by every chart, built once per process as a named template
+_template = go.layout.Template(pio.templates["plotly"])
+_template.layout.update(
+    height=400,
+    margin=dict(l=20, r=20, t=40, b=20),
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+)
+pio.templates["rain_check"] = _template
+
+# Serialized figures keyed by chart type and a content hash of the input frame
+_figure_cache = LRUCache(maxsize=128)
+
+def _frame_digest(df, columns):
+    """Content hash of the columns a chart is built from"""
+    hashed = pd.util.hash_pandas_object(df[columns], index=False)
+    return hashlib.blake2b(hashed.to_numpy().tobytes(), digest_size=16).hexdigest()
+
+def _cached_figure(name, df, columns, build):
+    """Build a figure once per distinct input and replay it from its JSON"""
+    key = (name, _frame_digest(df, columns))
+    fig_json = _figure_cache.get(key)
+    if fig_json is None:
+        fig_json = build(df).to_json()
+        _figure_cache.set(key, fig_json)
+    # The JSON came from a validated figure, so skip validating it again
+    return go.Figure(json.loads(fig_json), _validate=False)
+
+def clear_figure_cache():
+    _figure_cache.clear()
 
 def create_hourly_temp_chart(df):
     """Create hourly temperature chart"""
+    return _cached_figure("hourly", df, ['hour', 'temp'], _build_hourly_temp_chart)
+
+def create_daily_temp_chart(df):
+    """Create daily temperature chart with min/max range"""
+    return _cached_figure("daily", df, ['day', 'temp_day', 'temp_night'], _build_daily_temp_chart)
+
+def _build_hourly_temp_chart(df):
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=df['hour'],
@@ -14,18 +56,14 @@ def create_hourly_temp_chart(df):
     ))
 
     fig.update_layout(
+        template='rain_check',
         title='Hourly Temperature Forecast',
         xaxis_title='Hour',
         yaxis_title='Temperature (°C)',
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
     )
     return fig
 
-def create_daily_temp_chart(df):
-    """Create daily temperature chart with min/max range"""
+def _build_daily_temp_chart(df):
     fig = go.Figure()
 
     # Add range area for temperature
@@ -58,13 +96,75 @@ def create_daily_temp_chart(df):
     ))
 
     fig.update_layout(
+        template='rain_check',
         title='7-Day Temperature Forecast',
         xaxis_title='Day',
         yaxis_title='Temperature (°C)',
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return fig
+
+def create_observed_vs_forecast_chart(series):
+    """Create observed temperature chart with the forecasts made for the same times
+
+    series is the dict of arrays returned by WeatherService.get_observations.
+    """
+    df = pd.DataFrame({name: series[name] for name in ('time', 'temp', 'temp_min', 'temp_max', 'forecast_temp')})
+    return _cached_figure("observed", df, list(df.columns), _build_observed_vs_forecast_chart)
+
+def _build_observed_vs_forecast_chart(df):
+    fig = go.Figure()
+
+    # Shade the observed low-high band behind the lines
+    fig.add_trace(go.Scatter(
+        x=df['time'],
+        y=df['temp_max'],
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        name='Observed Range',
+        x=df['time'],
+        y=df['temp_min'],
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(30, 136, 229, 0.15)',
+        hoverinfo='skip'
+    ))
+
+    fig.add_trace(go.Scatter(
+        name='Observed',
+        x=df['time'],
+        y=df['temp'].round(1),
+        mode='lines',
+        line=dict(color='#1E88E5', width=2),
+        connectgaps=False
+    ))
+
+    fig.add_trace(go.Scatter(
+        name='Forecast',
+        x=df['time'],
+        y=df['forecast_temp'].round(1),
+        mode='lines',
+        line=dict(color='#FF9800', width=2, dash='dash'),
+        connectgaps=False
+    ))
+
+    fig.update_layout(
+        template='rain_check',
+        title='Observed vs. Forecast Temperature',
+        xaxis_title='Time (UTC)',
+        yaxis_title='Temperature (°C)',
         showlegend=True,
         legend=dict(
             orientation="h",
@@ -1,209 +1,506 @@
 import requests
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import pandas as pd
-from sqlalchemy.orm import Session
-from database import get_db, SearchHistory, WeatherCache
+from cache_backend import PostgresCacheBackend, get_cache_backend
+from cache_codec import FORMAT_VERSION, compact_payload, encode_payload
+from cities import normalize_city
+from city_search import get_city_index
+from history_writer import record_observation, record_search
+from memory_cache import LRUCache, TTLCache
+from metrics import Counter, Gauge, span
+from openweather_client import OpenWeatherClient
+from rate_limiter import BACKGROUND, RateLimited, current_priority, priority_scope
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Cached weather younger than CACHE_TTL is fresh. Between CACHE_TTL and
+# CACHE_MAX_AGE it is served stale while a background refresh runs; older
+# entries are treated as missing.
+CACHE_TTL = timedelta(minutes=30)
+CACHE_MAX_AGE = timedelta(hours=3)
+
+# Coordinates never change, so the in-process geocode cache needs no expiry
+_geocode_lru = LRUCache(maxsize=2048)
+
+# Process-wide first-tier cache in front of WeatherCache, shared by every
+# Streamlit session; bounded by entry count (compact payloads are ~2 KB each)
+_weather_l1 = TTLCache(maxsize=512, ttl=CACHE_MAX_AGE.total_seconds())
+
+# One in-flight upstream fetch per city and priority within this process;
+# see _flight_key
+_inflight = SingleFlight()
+
+# Also coalesce refetches across replicas with Postgres advisory locks
+ADVISORY_LOCKS = os.getenv("WEATHER_SINGLEFLIGHT_ADVISORY") == "1"
+
+# When OpenWeather is rate limiting us, cached weather up to this old is
+# served rather than an error
+RATE_LIMIT_FALLBACK_AGE = timedelta(hours=24)
+
+# Observation ranges up to this long are read at hourly resolution, longer
+# ones from the daily buckets
+HOURLY_OBSERVATION_RANGE = timedelta(days=14)
+
+# Background revalidation of stale entries, at most one per city at a time
+_revalidate_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="revalidate")
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+CACHE_LOOKUPS = Counter(
+    "raincheck_cache_lookups_total", "Weather cache lookups by tier and result", ["tier", "result"]
+)
+STALE_SERVED = Counter(
+    "raincheck_stale_served_total", "Stale cache entries served while revalidating"
+)
+Gauge(
+    "raincheck_l1_cache", "In-process weather cache counters",
+    lambda: {(name,): value for name, value in _weather_l1.stats().items()}, ["stat"]
+)
+Gauge(
+    "raincheck_singleflight_fetches", "Upstream fetches executed or shared by waiting callers",
+    lambda: {("executed",): _inflight.executions, ("shared",): _inflight.shared, ("in_flight",): _inflight.in_flight()},
+    ["state"]
+)
+
+def _rate_limited_message(error):
+    return f"Weather service is busy, please try again in {max(1, round(error.retry_after))} seconds"
+
+def _age(weather_data):
+    return datetime.utcnow() - weather_data["fetched_at"]
+
+def _flight_key(key):
+    """Single-flight key for a city at the caller's priority
+
+    Interactive callers never wait on a background refresh, which may be
+    queued behind the rate limiter for far longer than they would wait.
+    """
+    return (key, current_priority())
+
+def _is_fresh(weather_data):
+    return weather_data is not None and _age(weather_data) <= CACHE_TTL
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else get_cache_backend()
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
         if not self.api_key:
             raise ValueError("OpenWeather API key not found. Please set the OPENWEATHER_API_KEY environment variable.")
-        self.base_url = "https://api.openweathermap.org/data/2.5"
-        self.db = get_db()  # May be None if database connection fails
+        self.client = OpenWeatherClient(self.api_key)
+
+    def get_weather_data(self, city, force_refresh=False, record_history=True):
+        """Fetch weather data for a given city
 
-    def get_weather_data(self, city):
-        """Fetch weather data for a given city"""
+        force_refresh skips the cache lookup and always refetches, and
+        record_history=False keeps background fetches out of the search history.
+        The result carries fetched_at (UTC), age_seconds and a stale flag that
+        is set when a cached entry is served while it is being refreshed.
+        """
         try:
             if not city:
                 raise ValueError("City name cannot be empty")
 
-            # Try to store search history if database is available
-            if self.db:
-                try:
-                    search_history = SearchHistory(city=city)
-                    self.db.add(search_history)
-                    self.db.commit()
-                except Exception:
-                    # Ignore database errors and continue with weather data fetch
-                    if self.db:
-                        self.db.rollback()
+            # Queue the search for the background history writer
+            if record_history:
+                record_search(city)
 
-            # Try to get cached data if database is available
-            cached_data = None
-            if self.db:
-                try:
-                    cached_data = self.db.query(WeatherCache).filter(
-                        WeatherCache.city == city,
-                        WeatherCache.timestamp > datetime.utcnow() - timedelta(minutes=30)
-                    ).first()
-                except Exception:
-                    # Ignore cache errors and continue with fresh data fetch
-                    if self.db:
-                        self.db.rollback()
-
-            if cached_data:
-                return {
-                    "current": cached_data.current_data,
-                    "hourly": cached_data.hourly_data,
-                    "daily": cached_data.daily_data
-                }
-
-            # Get coordinates
-            geocoding_url = "https://api.openweathermap.org/geo/1.0/direct"
-            params = {
-                "q": city,
-                "limit": 1,
-                "appid": self.api_key
-            }
-            location_response = requests.get(geocoding_url, params=params)
-            if location_response.status_code == 401:
-                raise ValueError("Invalid API key. Please check your OpenWeather API key.")
-            location_response.raise_for_status()
-            location = location_response.json()
+            key = normalize_city(city)
 
-            if not location:
-                raise ValueError(f"City '{city}' not found")
+            # Serve from the in-process cache, then the database cache
+            if not force_refresh:
+                weather_data = _weather_l1.get(key)
+                CACHE_LOOKUPS.inc("l1", "hit" if weather_data else "miss")
+                if not weather_data:
+                    weather_data = self._read_cache(key)
+                if weather_data:
+                    if not _is_fresh(weather_data):
+                        # Serve stale data now and refresh it in the background
+                        STALE_SERVED.inc()
+                        self._revalidate(city, key)
+                    return self._with_age(weather_data)
 
-            lat, lon = location[0]['lat'], location[0]['lon']
+            # Concurrent misses for the same city share a single upstream fetch
+            return self._with_age(_inflight.do(_flight_key(key), self._refresh, city, key, force_refresh))
 
-            # Get current weather
-            current_params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.api_key,
-                "units": "metric"
-            }
-            current_response = requests.get(f"{self.base_url}/weather", params=current_params)
-            if current_response.status_code == 401:
-                raise ValueError("Invalid API key. Please check your OpenWeather API key.")
-            current_response.raise_for_status()
-            current_data = current_response.json()
-            # Log the API response for current weather
-            print("Current Weather API Response:", current_response.json())
-
-            # Get forecast data
-            forecast_params = current_params.copy()
-            forecast_response = requests.get(f"{self.base_url}/forecast", params=forecast_params)
-            if forecast_response.status_code == 401:
+        except RateLimited as e:
+            # Over quota: serve any cached copy we still have, however old,
+            # unless the caller asked for fresh data
+            weather_data = None if force_refresh else self._read_fallback(normalize_city(city))
+            if weather_data:
+                return self._with_age(weather_data)
+            raise RateLimited(_rate_limited_message(e), e.retry_after)
+        except requests.exceptions.RequestException as e:
+            if "401" in str(e):
                 raise ValueError("Invalid API key. Please check your OpenWeather API key.")
-            forecast_response.raise_for_status()
-            forecast_data = forecast_response.json()
-            # Log the API response for forecast data
-            print("Forecast API Response:", forecast_response.json())
+            raise Exception(f"Error fetching weather data: {str(e)}")
+        except ValueError as e:
+            raise ValueError(str(e))
+        except Exception as e:
+            raise Exception(f"An unexpected error occurred: {str(e)}")
+
+    def get_cached_weather(self, city):
+        """Fresh weather from the in-process cache only, or None; never waits on I/O"""
+        weather_data = _weather_l1.get(normalize_city(city))
+        if weather_data and _is_fresh(weather_data):
+            CACHE_LOOKUPS.inc("l1", "hit")
+            return self._with_age(weather_data)
+        return None
+
+    def get_weather_bulk(self, cities, record_history=False, max_workers=8):
+        """Fetch weather data for many cities at once
 
-            # Process forecast data
-            hourly_data = forecast_data["list"][:8]  # Next 24 hours (3-hour intervals)
-            daily_data = self._process_daily_from_forecast(forecast_data["list"])
+        Cache hits are resolved from memory and then with a single database
+        query; misses are fetched concurrently under the upstream rate limit
+        and written back with one bulk upsert. Returns (results, errors),
+        dicts keyed by the city names as given.
+        """
+        keys = {}
+        for city in cities:
+            if city:
+                keys.setdefault(normalize_city(city), city)
+                if record_history:
+                    record_search(city)
 
-            # Try to store in cache if database is available
-            if self.db:
+        entries = {}
+        stale = {}
+        for key in keys:
+            weather_data = _weather_l1.get(key)
+            if _is_fresh(weather_data):
+                entries[key] = weather_data
+            elif weather_data:
+                stale[key] = weather_data
+        CACHE_LOOKUPS.inc("l1", "hit", amount=len(entries) + len(stale))
+        CACHE_LOOKUPS.inc("l1", "miss", amount=len(keys) - len(entries) - len(stale))
+
+        # Stale memory entries are looked up too: the warmer or another
+        # process may have refreshed the persistent cache since
+        remaining = [key for key in keys if key not in entries]
+        if remaining:
+            try:
+                with span("cache_read"):
+                    cached = self.cache.get_many(remaining, CACHE_MAX_AGE)
+                for key, (payload, fetched_at) in cached.items():
+                    if key not in stale or fetched_at > stale[key]["fetched_at"]:
+                        entries[key] = self._promote(key, payload, fetched_at)
+            except Exception:
+                # Ignore cache errors and fetch everything fresh
+                pass
+            hits = sum(1 for key in remaining if key in entries)
+            CACHE_LOOKUPS.inc(self.cache.name, "hit", amount=hits)
+            CACHE_LOOKUPS.inc(self.cache.name, "miss", amount=len(remaining) - hits)
+            for key, weather_data in stale.items():
+                entries.setdefault(key, weather_data)
+
+        for key, weather_data in entries.items():
+            if not _is_fresh(weather_data):
+                STALE_SERVED.inc()
+                self._revalidate(keys[key], key)
+
+        errors = {}
+        misses = [key for key in keys if key not in entries]
+        if misses:
+            rows = []
+
+            # Upstream calls are paced by the client's shared rate limiter
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(misses)), thread_name_prefix="bulk-fetch") as executor:
+                futures = {key: executor.submit(self._fetch_entry, keys[key], key) for key in misses}
+                for key, future in futures.items():
+                    try:
+                        row, weather_data = future.result()
+                    except RateLimited as e:
+                        weather_data = self._read_fallback(key)
+                        if weather_data:
+                            entries[key] = weather_data
+                        else:
+                            errors[keys[key]] = _rate_limited_message(e)
+                        continue
+                    except requests.exceptions.RequestException as e:
+                        errors[keys[key]] = f"Error fetching weather data: {str(e)}"
+                        continue
+                    except Exception as e:
+                        errors[keys[key]] = str(e)
+                        continue
+                    rows.append(row)
+                    entries[key] = weather_data
+                    _weather_l1.set(key, weather_data)
+
+            # Try to store all fetched cities in one statement
+            if rows:
                 try:
-                    weather_cache = WeatherCache(
-                        city=city,
-                        lat=lat,
-                        lon=lon,
-                        current_data=current_data,
-                        hourly_data=hourly_data,
-                        daily_data=daily_data
-                    )
-                    self.db.add(weather_cache)
-                    self.db.commit()
+                    with span("cache_write"):
+                        self.cache.put_many(rows)
                 except Exception:
                     # Ignore cache storage errors
-                    if self.db:
-                        self.db.rollback()
+                    pass
+
+        results = {keys[key]: self._with_age(entries[key]) for key in keys if key in entries}
+        return results, errors
+
+    def _read_cache(self, key, db=None):
+        """Look up cached weather in the persistent cache and promote it to memory"""
+        try:
+            with span("cache_read"):
+                if db is None:
+                    entry = self.cache.get(key, CACHE_MAX_AGE)
+                else:
+                    entry = self.cache.get_many([key], CACHE_MAX_AGE, db).get(key)
+        except Exception:
+            # Ignore cache errors and continue with fresh data fetch
+            CACHE_LOOKUPS.inc(self.cache.name, "error")
+            return None
+
+        CACHE_LOOKUPS.inc(self.cache.name, "hit" if entry else "miss")
+        return self._promote(key, *entry) if entry else None
+
+    def _read_fallback(self, key):
+        """Cached weather past its normal lifetime, for when the API is unavailable"""
+        try:
+            entry = self.cache.get(key, RATE_LIMIT_FALLBACK_AGE)
+        except Exception:
+            return None
+        if not entry:
+            return None
+        payload, fetched_at = entry
+        return {**payload, "fetched_at": fetched_at}
 
+    def _promote(self, key, payload, fetched_at):
+        """Keep a persistent cache entry in memory for the rest of its lifetime"""
+        weather_data = {**payload, "fetched_at": fetched_at}
+        remaining = CACHE_MAX_AGE - _age(weather_data)
+        _weather_l1.set(key, weather_data, ttl=remaining.total_seconds())
+        return weather_data
+
+    def _with_age(self, weather_data):
+        """Copy of a cache entry annotated with how old its data is"""
+        age = _age(weather_data)
+        return {
+            **weather_data,
+            "age_seconds": max(0, int(age.total_seconds())),
+            "stale": age > CACHE_TTL
+        }
+
+    def _revalidate(self, city, key):
+        """Refresh a stale city in the background unless a refresh is already running"""
+        with _revalidating_lock:
+            if key in _revalidating:
+                return
+            _revalidating.add(key)
+
+        def run():
+            try:
+                # Interactive fetches get upstream calls ahead of this one
+                with priority_scope(BACKGROUND):
+                    _inflight.do(_flight_key(key), self._refresh, city, key, False)
+            except Exception as e:
+                logger.warning("Background refresh failed for %s: %s", city, e)
+            finally:
+                with _revalidating_lock:
+                    _revalidating.discard(key)
+
+        _revalidate_executor.submit(run)
+
+    def _refresh(self, city, key, force_refresh):
+        """Refetch a city, optionally serialized across replicas by an advisory lock"""
+        if not force_refresh:
+            # A fetch that finished just before this one started already filled memory
+            weather_data = _weather_l1.get(key)
+            if _is_fresh(weather_data):
+                return weather_data
+            if weather_data is not None:
+                # Revalidating a stale memory entry: the warmer or another
+                # process may have refreshed the persistent cache since
+                weather_data = self._read_cache(key)
+                if _is_fresh(weather_data):
+                    return weather_data
+        if ADVISORY_LOCKS and isinstance(self.cache, PostgresCacheBackend):
+            return self._refresh_with_advisory_lock(city, key, force_refresh)
+        return self._fetch_and_store(city, key)
+
+    def _refresh_with_advisory_lock(self, city, key, force_refresh):
+        # SQLAlchemy is only imported once the database is actually used
+        from sqlalchemy import text
+        from sqlalchemy.exc import SQLAlchemyError
+        from database import session_scope
+
+        try:
+            with session_scope() as db:
+                # Held until commit, so other replicas wait here instead of refetching
+                db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"weather_cache:{key}"})
+                weather_data = None
+                if not force_refresh:
+                    # Another replica may have refreshed the city while we waited
+                    weather_data = self._read_cache(key, db)
+                if not _is_fresh(weather_data):
+                    weather_data = self._fetch_and_store(city, key, db)
+                db.commit()
+                return weather_data
+        except SQLAlchemyError:
+            # Without the database lock, fall back to a process-local refresh
+            return self._fetch_and_store(city, key)
+
+    def _fetch_and_store(self, city, key, db=None):
+        """Fetch fresh weather from the API and write it to both cache tiers"""
+        row, weather_data = self._fetch_entry(city, key)
+        # Try to store in cache if it is available
+        try:
+            with span("cache_write"):
+                if db is None:
+                    self.cache.put_many([row])
+                else:
+                    self.cache.put_many([row], db)
+        except Exception:
+            # Ignore cache storage errors
+            pass
+
+        _weather_l1.set(key, weather_data)
+        return weather_data
+
+    def _fetch_entry(self, city, key):
+        """Fetch fresh weather from the API; returns (cache row, weather data)"""
+        # Get coordinates
+        lat, lon = self._get_coordinates(city)
+
+        # Get current weather and forecast data concurrently
+        current_data, forecast_data = self.client.current_and_forecast(lat, lon)
+        # Log the API responses (formatted only when debug logging is on)
+        logger.debug("Current Weather API Response: %s", current_data)
+        logger.debug("Forecast API Response: %s", forecast_data)
+
+        # Keep only what the UI renders, with the forecast already aggregated
+        payload = compact_payload(
+            current_data, forecast_data["list"], forecast_data.get("city", {}).get("timezone", 0)
+        )
+
+        row = {
+            "city": key,
+            "lat": lat,
+            "lon": lon,
+            "payload": encode_payload(payload),
+            "format_version": FORMAT_VERSION,
+            "timestamp": datetime.utcnow()
+        }
+        self._record_observation(key, payload, row["timestamp"])
+        return row, {**payload, "fetched_at": row["timestamp"]}
+
+    def _record_observation(self, key, payload, fetched_at):
+        """Queue the observed conditions and the nearest forecast step for the observation store"""
+        current = payload["current"]
+        hourly = payload["hourly"]
+        record_observation({
+            "city": key,
+            "dt": current["dt"] or (fetched_at - datetime(1970, 1, 1)).total_seconds(),
+            "temp": current["temp"],
+            "humidity": current["humidity"],
+            "pressure": current["pressure"],
+            "wind_speed": current["wind_speed"],
+            "forecast_dt": hourly["dt"][0] if hourly.get("dt") else None,
+            "forecast_temp": hourly["temp"][0] if hourly.get("temp") else None,
+        })
+
+    def get_observations(self, city, days=7, end=None, resolution=None):
+        """Observed weather and forecasts for a city over the last days, as NumPy arrays
+
+        Returns a dict of equal-length arrays: time (datetime64, bucket start
+        in UTC), temp, temp_min, temp_max, humidity, pressure, wind_speed and
+        forecast_temp, the mean forecast made for that bucket. Buckets are
+        hourly for short ranges and daily for long ones unless resolution is
+        given; missing values are NaN.
+        """
+        import numpy as np
+        from database import OBSERVATION_COLUMNS, database_configured, observation_range, session_scope
+
+        end = end or datetime.utcnow()
+        start = end - timedelta(days=days)
+        if resolution is None:
+            resolution = "hour" if end - start <= HOURLY_OBSERVATION_RANGE else "day"
+        rows = []
+        if database_configured():
+            try:
+                with span("observation_read"), session_scope() as db:
+                    rows = observation_range(db, normalize_city(city), start, end, resolution)
+            except Exception:
+                logger.exception("Error reading weather observations for %s", city)
+
+        columns = dict(zip(OBSERVATION_COLUMNS, zip(*rows))) if rows else dict.fromkeys(OBSERVATION_COLUMNS, ())
+        values = {name: np.array(columns[name], dtype=np.float64) for name in OBSERVATION_COLUMNS[1:]}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            samples = np.where(values["samples"] > 0, values["samples"], np.nan)
+            forecast_samples = np.where(values["forecast_samples"] > 0, values["forecast_samples"], np.nan)
             return {
-                "current": current_data,
-                "hourly": hourly_data,
-                "daily": daily_data
+                "time": np.array(columns["bucket"], dtype="datetime64[s]"),
+                "temp": values["temp_sum"] / samples,
+                "temp_min": values["temp_min"],
+                "temp_max": values["temp_max"],
+                "humidity": values["humidity_sum"] / samples,
+                "pressure": values["pressure_sum"] / samples,
+                "wind_speed": values["wind_speed_sum"] / samples,
+                "forecast_temp": values["forecast_temp_sum"] / forecast_samples,
             }
 
-        except requests.exceptions.RequestException as e:
-            if "401" in str(e):
-                raise ValueError("Invalid API key. Please check your OpenWeather API key.")
-            raise Exception(f"Error fetching weather data: {str(e)}")
-        except ValueError as e:
-            raise ValueError(str(e))
-        except Exception as e:
-            raise Exception(f"An unexpected error occurred: {str(e)}")
+    def _get_coordinates(self, city):
+        """Resolve a city to (lat, lon), consulting the geocode caches before the API"""
+        key = normalize_city(city)
+        coords = _geocode_lru.get(key)
+        if coords:
+            return coords
+
+        # Known cities resolve locally from the bundled gazetteer
+        try:
+            with span("gazetteer"):
+                coords = get_city_index().resolve(city)
+        except Exception:
+            # A missing or unreadable gazetteer just means a geocode lookup
+            coords = None
+        if coords:
+            _geocode_lru.set(key, coords)
+            return coords
+
+        # Try the persistent geocode cache if it is available
+        try:
+            coords = self.cache.get_location(key)
+        except Exception:
+            # Ignore cache errors and fall back to the geocoding API
+            pass
+        if coords:
+            _geocode_lru.set(key, coords)
+            return coords
+
+        location = self.client.geocode(city)
+
+        if not location:
+            raise ValueError(f"City '{city}' not found")
+
+        coords = (location[0]['lat'], location[0]['lon'])
+        _geocode_lru.set(key, coords)
+
+        # Try to store coordinates if the cache is available
+        try:
+            self.cache.put_location(key, coords[0], coords[1])
+        except Exception:
+            # Ignore geocode cache storage errors
+            pass
+
+        return coords
 
     def process_hourly_forecast(self, data):
         """Process hourly forecast data"""
-        try:
-            df = pd.DataFrame([{
-                'hour': datetime.fromtimestamp(item['dt']).strftime('%H:%M'),
-                'temp': item['main']['temp'],
-                'weather': item['weather']
-            } for item in data['hourly']])
+        import pandas as pd
 
-            df['temp'] = df['temp'].round(1)
-            return df
+        try:
+            return pd.DataFrame(data['hourly'])
 
         except Exception as e:
             raise Exception(f"Error processing hourly forecast: {str(e)}")
 
     def process_daily_forecast(self, data):
         """Process daily forecast data"""
-        try:
-            df = pd.DataFrame([{
-                'day': datetime.fromtimestamp(item['dt']).strftime('%A'),
-                'temp_day': item['main']['temp_max'],
-                'temp_night': item['main']['temp_min'],
-                'weather': item['weather']
-            } for item in data])
+        import pandas as pd
 
-            df['temp_day'] = df['temp_day'].round(1)
-            df['temp_night'] = df['temp_night'].round(1)
-            return df
+        try:
+            return pd.DataFrame(data)
 
         except Exception as e:
             raise Exception(f"Error processing daily forecast: {str(e)}")
-
-    def _process_daily_from_forecast(self, forecast_list):
-        """Process 5-day forecast data into daily format"""
-        daily_data = []
-        current_date = None
-        daily_temps_max = []
-        daily_temps_min = []
-        last_dt = None
-
-        for item in forecast_list:
-            date = datetime.fromtimestamp(item['dt']).date()
-
-            if date != current_date:
-                if current_date:
-                    daily_data.append({
-                        'dt': last_dt,
-                        'main': {
-                            'temp_max': max(daily_temps_max),
-                            'temp_min': min(daily_temps_min),
-                        },
-                        'weather': item['weather']
-                    })
-                    daily_temps_max = []
-                    daily_temps_min = []
-
-                current_date = date
-            
-            last_dt = item['dt']
-            daily_temps_max.append(item['main']['temp_max'])
-            daily_temps_min.append(item['main']['temp_min'])
-
-            if len(daily_data) >= 7:
-                break
-
-        # Process the last day
-        if current_date and daily_temps_max and daily_temps_min:
-            daily_data.append({
-                'dt': last_dt,
-                'main': {
-                    'temp_max': max(daily_temps_max),
-                    'temp_min': min(daily_temps_min),
-                },
-                'weather': item['weather']
-            })
-
-        return daily_data